@@ -1,4 +1,5 @@
 import crypto from 'crypto';
+import { LOG_PAYLOADS } from './config';
 
 export interface ArcPayConfig {
   apiKey: string;
@@ -209,7 +210,7 @@ async function generateArcPayCheckoutUrl(
 
   try {
     console.log('🌐 Calling ArcPay API:', arcPayApiUrl);
-    console.log('📦 Final payload before sending:', JSON.stringify(payload, null, 2));
+    if (LOG_PAYLOADS) console.log('📦 Final payload before sending:', JSON.stringify(payload, null, 2));
 
     // Use retry logic for network resilience
     const response = await fetchWithRetry(
@@ -240,7 +241,7 @@ async function generateArcPayCheckoutUrl(
     }
 
     const data = await response.json();
-    console.log('📥 ArcPay response:', JSON.stringify(data, null, 2));
+    if (LOG_PAYLOADS) console.log('📥 ArcPay response:', JSON.stringify(data, null, 2));
 
     // ArcPay returns { orderId, paymentUrl } on success
     if (data.paymentUrl) {
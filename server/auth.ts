@@ -5,8 +5,9 @@ import express, { type RequestHandler } from "express";
 import session from "express-session";
 import connectPg from "connect-pg-simple";
 import crypto from "crypto";
-import { storage } from "./storage";
+import { storage, recordLoginTracking } from "./storage";
 import { pool } from "./db";
+import { LOG_DEBUG } from "./config";
 import { 
   validateDeviceAndDetectDuplicate, 
   banUserForMultipleAccounts,
@@ -14,9 +15,6 @@ import {
   createBanLog,
   type DeviceInfo 
 } from "./deviceTracking";
-import { users } from "../shared/schema";
-import { db } from "./db";
-import { eq } from "drizzle-orm";
 
 // Helper to extract client IP from request
 function getClientIP(req: any): string {
@@ -94,7 +92,7 @@ export function verifyTelegramWebAppData(initData: string, botToken: string): {
     }
     
     const user = JSON.parse(userString);
-    console.log('✅ Telegram data verified successfully for user:', user.id);
+    if (LOG_DEBUG) console.log('✅ Telegram data verified successfully for user:', user.id);
     
     return { isValid: true, user };
   } catch (error) {
@@ -138,7 +136,7 @@ export const authenticateTelegram: RequestHandler = async (req: any, res, next)
     
     // Check for existing session first (before requiring Telegram data)
     if (!telegramData && req.session?.user?.user?.id) {
-      console.log('🔄 Using existing session for user:', req.session.user.user.id);
+      if (LOG_DEBUG) console.log('🔄 Using existing session for user:', req.session.user.user.id);
       req.user = req.session.user;
       return next();
     }
@@ -302,20 +300,15 @@ export const authenticateTelegram: RequestHandler = async (req: any, res, next)
     }
     
     // Update user tracking data on every login (IP, user agent, app version, etc.)
-    try {
-      await db.update(users).set({
-        lastLoginAt: new Date(),
-        lastLoginIp: clientIP,
-        lastLoginUserAgent: userAgent,
-        lastLoginDevice: deviceId || deviceInfo?.deviceId,
-        appVersion: appVersion || undefined,
-        browserFingerprint: deviceInfo?.fingerprint ? JSON.stringify(deviceInfo.fingerprint) : undefined,
-        updatedAt: new Date(),
-      }).where(eq(users.id, upsertedUser.id));
-      console.log(`📍 Updated tracking data for user ${upsertedUser.id}: IP=${clientIP}`);
-    } catch (trackingError) {
-      console.error('⚠️ Failed to update user tracking data:', trackingError);
-    }
+    // Buffered and written in batches - see flushLoginTracking()
+    recordLoginTracking(upsertedUser.id, {
+      lastLoginAt: new Date(),
+      lastLoginIp: clientIP,
+      lastLoginUserAgent: userAgent,
+      lastLoginDevice: deviceId || deviceInfo?.deviceId,
+      appVersion: appVersion || undefined,
+      browserFingerprint: deviceInfo?.fingerprint ? JSON.stringify(deviceInfo.fingerprint) : undefined,
+    });
     
     // Send welcome message for new users with referral code
     if (isNewUser) {
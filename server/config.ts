@@ -27,6 +27,14 @@ export const config = {
   },
 };
 
+// Full payload dumps (webhook updates, outgoing Bot API / ArcPay bodies) are only
+// serialized when explicitly enabled, so production logging skips the JSON.stringify work
+export const LOG_PAYLOADS = process.env.LOG_PAYLOADS === 'true';
+
+// Per-request diagnostics (session reuse, membership checks, counters) only print with
+// LOG_LEVEL=debug - a disabled check skips building the message string entirely
+export const LOG_DEBUG = process.env.LOG_LEVEL === 'debug';
+
 // Helper function to get channel config for API responses
 export function getChannelConfig() {
   return {
@@ -7,9 +7,124 @@ if (!process.env.DATABASE_URL) {
   throw new Error("DATABASE_URL must be set for database connection");
 }
 
-export const pool = new Pool({ 
+// Pool sizing - concurrent webhook updates share up to DB_POOL_MAX sockets
+const DB_POOL_MIN = parseInt(process.env.DB_POOL_MIN || '5', 10);
+const DB_POOL_MAX = parseInt(process.env.DB_POOL_MAX || '25', 10);
+
+export const pool = new Pool({
   connectionString: process.env.DATABASE_URL,
-  ssl: { rejectUnauthorized: false }
+  ssl: { rejectUnauthorized: false },
+  min: DB_POOL_MIN,
+  max: DB_POOL_MAX,
+  idleTimeoutMillis: 30000,
+  connectionTimeoutMillis: 10000,
 });
 
+// Circuit breaker: once the database stops answering, queries are refused up front
+// instead of each one waiting out connectionTimeoutMillis. Connection failures from
+// real queries, pool checkouts and idle clients all count. After the cooldown the
+// breaker goes half-open: application queries stay blocked and only the background
+// probe runs - its success closes the breaker, its failure re-opens it.
+const BREAKER_FAILURE_THRESHOLD = 5;
+const BREAKER_COOLDOWN_MS = 10000;
+const HEALTH_PING_INTERVAL_MS = 2000;
+
+type BreakerState = 'closed' | 'open' | 'half-open';
+
+const breaker = {
+  state: 'closed' as BreakerState,
+  failures: 0,
+  openedAt: 0,
+};
+
+// SQL errors (constraint violations, bad input...) carry a SQLSTATE and say nothing
+// about availability; connect timeouts, dropped sockets and class 08/57P codes do
+function isConnectionError(err: any): boolean {
+  const code: string | undefined = err?.code;
+  return !code || code.startsWith('E') || code.startsWith('08') || code.startsWith('57P');
+}
+
+function recordDbSuccess(): void {
+  if (breaker.state !== 'closed') {
+    console.log('✅ [DB BREAKER] Database reachable again, closing breaker');
+  }
+  breaker.state = 'closed';
+  breaker.failures = 0;
+}
+
+function recordDbFailure(err: Error): void {
+  breaker.failures++;
+
+  // A failed probe while half-open re-opens immediately
+  if (breaker.state === 'half-open' || (breaker.state === 'closed' && breaker.failures >= BREAKER_FAILURE_THRESHOLD)) {
+    console.error(`❌ [DB BREAKER] Opening breaker after ${breaker.failures} failures:`, err.message);
+    breaker.state = 'open';
+    breaker.openedAt = Date.now();
+  }
+}
+
+export function isDatabaseAvailable(): boolean {
+  if (breaker.state === 'open' && Date.now() - breaker.openedAt >= BREAKER_COOLDOWN_MS) {
+    breaker.state = 'half-open';
+  }
+  return breaker.state === 'closed';
+}
+
+// Application traffic reaches Postgres through pool.query (plain queries) and
+// pool.connect (transactions) - gate and observe both. The health probe keeps the raw query.
+const rawQuery = pool.query.bind(pool) as (...args: any[]) => any;
+const rawConnect = pool.connect.bind(pool) as (...args: any[]) => any;
+
+function guardPoolCall(call: (...args: any[]) => any, args: any[]): any {
+  // Callback-style calls are left alone (node-postgres internals, connect-pg-simple)
+  if (typeof args[args.length - 1] === 'function') {
+    return call(...args);
+  }
+  if (!isDatabaseAvailable()) {
+    return Promise.reject(new Error('Database unavailable (circuit breaker open)'));
+  }
+  const result = call(...args);
+  result.then(
+    () => {
+      if (breaker.state === 'closed') breaker.failures = 0;
+    },
+    (err: any) => {
+      if (breaker.state === 'closed' && isConnectionError(err)) recordDbFailure(err);
+    }
+  );
+  return result;
+}
+
+pool.query = ((...args: any[]) => guardPoolCall(rawQuery, args)) as typeof pool.query;
+pool.connect = ((...args: any[]) => guardPoolCall(rawConnect, args)) as typeof pool.connect;
+
+// An idle client dropping its connection must not take the whole process down
+pool.on('error', (err) => {
+  console.error('❌ [DB POOL] Idle client error:', err.message);
+  if (breaker.state === 'closed') recordDbFailure(err);
+});
+
+let pingInFlight = false;
+
+const healthPing = setInterval(async () => {
+  // A hung connect must not stack up probes behind it; while open, wait out the cooldown
+  isDatabaseAvailable(); // moves open -> half-open once the cooldown has passed
+  if (pingInFlight || breaker.state === 'open') return;
+  pingInFlight = true;
+  try {
+    await rawQuery('SELECT 1');
+    recordDbSuccess();
+  } catch (err: any) {
+    recordDbFailure(err);
+  } finally {
+    pingInFlight = false;
+  }
+}, HEALTH_PING_INTERVAL_MS);
+healthPing.unref();
+
+// Called from the server's shutdown sequence before the pool is ended
+export function stopDatabaseHealthPing(): void {
+  clearInterval(healthPing);
+}
+
 export const db = drizzle(pool, { schema });
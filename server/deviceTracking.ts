@@ -1,8 +1,9 @@
 import crypto from "crypto";
-import { db, pool } from "./db";
+import { db } from "./db";
 import { users, banLogs } from "../shared/schema";
 import { eq, and, ne, or, sql } from "drizzle-orm";
 import { config } from "./config";
+import { invalidateUserCache } from "./storage";
 
 const ADMIN_TELEGRAM_ID = config.bot.adminId || process.env.TELEGRAM_ADMIN_ID || '';
 
@@ -206,6 +207,7 @@ export async function validateDeviceAndDetectDuplicate(
           lastLoginUserAgent: userAgent || currentUserAccount.lastLoginUserAgent,
         })
         .where(eq(users.id, currentUserAccount.id));
+      invalidateUserCache(currentUserAccount.id);
 
       return {
         isValid: true,
@@ -329,6 +331,7 @@ export async function banUserForMultipleAccounts(
         isPrimaryAccount: false,
       })
       .where(eq(users.id, userId));
+    invalidateUserCache(userId);
 
     // Only create ban log if this is a NEW ban (prevents duplicate entries)
     if (!wasAlreadyBanned) {
@@ -412,6 +415,7 @@ export async function manualBanUser(
         bannedAt: new Date(),
       })
       .where(eq(users.id, userId));
+    invalidateUserCache(userId);
 
     // Create comprehensive ban log for manual ban with all tracking data
     await createBanLog({
@@ -710,6 +714,7 @@ export async function unbanUser(userId: string, unbannedBy: string): Promise<boo
         updatedAt: new Date(),
       })
       .where(eq(users.id, userId));
+    invalidateUserCache(userId);
     
     // Create an unban log entry
     await createBanLog({
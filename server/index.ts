@@ -4,6 +4,8 @@ import { setupVite, serveStatic, log } from "./vite";
 import { setupAuth } from "./auth";
 import { ensureDatabaseSchema } from "./migrate";
 import { countryBlockingMiddleware } from "./countryBlocking";
+import { LOG_PAYLOADS } from "./config";
+import { isDatabaseAvailable, pool, stopDatabaseHealthPing } from "./db";
 
 // CRITICAL: Run database migrations before ANYTHING else
 // This ensures the telegram_id column exists before any database operations
@@ -30,16 +32,30 @@ app.use(express.urlencoded({ extended: false }));
 // Country blocking middleware - must be early to block requests before any other processing
 app.use(countryBlockingMiddleware);
 
+// Fail fast while the database breaker is open - a 503 also makes Telegram redeliver
+// webhook updates later instead of them being acknowledged and lost
+app.use('/api', (req, res, next) => {
+  if (req.path !== '/health' && !isDatabaseAvailable()) {
+    return res.status(503).json({ message: 'Service temporarily unavailable, please try again shortly' });
+  }
+  next();
+});
+
 // Add webhook route BEFORE any other middleware to ensure it works
 app.post('/api/telegram/webhook', async (req: any, res) => {
   try {
-    console.log('📨 Direct webhook called!', JSON.stringify(req.body, null, 2));
+    console.log('📨 Direct webhook called! update_id:', req.body?.update_id);
+    if (LOG_PAYLOADS) console.log('📨 Update payload:', JSON.stringify(req.body, null, 2));
+    
+    const { enqueueTelegramUpdate } = await import('./telegram');
     
-    const { handleTelegramMessage } = await import('./telegram');
-    const handled = await handleTelegramMessage(req.body);
-    console.log('✅ Message handled:', handled);
+    // Acknowledge immediately so Telegram keeps delivering updates while this one
+    // is processed - a slow DB/API call must not hold up unrelated chats
+    res.status(200).json({ ok: true });
     
-    res.status(200).json({ ok: true, handled });
+    enqueueTelegramUpdate(req.body)
+      .then((handled) => console.log('✅ Message handled:', handled))
+      .catch((error) => console.error('❌ Direct webhook processing error:', error));
   } catch (error) {
     console.error('❌ Direct webhook error:', error);
     res.status(500).json({ error: 'Internal server error' });
@@ -134,7 +150,7 @@ app.use((req, res, next) => {
       const duration = Date.now() - start;
       if (path.startsWith("/api")) {
         let logLine = `${req.method} ${path} ${res.statusCode} in ${duration}ms`;
-        if (capturedJsonResponse) {
+        if (LOG_PAYLOADS && capturedJsonResponse) {
           const responseStr = JSON.stringify(capturedJsonResponse);
           logLine += ` :: ${responseStr}`;
         }
@@ -163,6 +179,40 @@ app.use((req, res, next) => {
   // IMPORTANT: Register API routes BEFORE Vite middleware to prevent catch-all interference
   const server = await registerRoutes(app);
 
+  // Graceful shutdown: stop taking requests, let queued bot updates finish, write the
+  // buffered login tracking and only then release the database pool
+  const SHUTDOWN_HTTP_GRACE_MS = 10000;
+  let shuttingDown = false;
+  const shutdown = async (signal: NodeJS.Signals) => {
+    if (shuttingDown) return;
+    shuttingDown = true;
+    console.log(`🛑 ${signal} received, shutting down...`);
+    
+    try {
+      // Open WebSocket connections keep close() pending, so bound the wait for in-flight requests
+      await Promise.race([
+        new Promise<void>((resolve) => server.close(() => resolve())),
+        new Promise<void>((resolve) => setTimeout(resolve, SHUTDOWN_HTTP_GRACE_MS).unref()),
+      ]);
+      
+      const { drainTelegramUpdates } = await import('./telegram');
+      await drainTelegramUpdates();
+      
+      const { flushLoginTracking } = await import('./storage');
+      await flushLoginTracking();
+      
+      stopDatabaseHealthPing();
+      await pool.end();
+      console.log(`✅ [DB POOL] Connection pool closed (${signal})`);
+    } catch (error) {
+      console.error('❌ Error during shutdown:', error);
+    }
+    process.exit(0);
+  };
+  
+  process.once('SIGTERM', shutdown);
+  process.once('SIGINT', shutdown);
+
   // Error handling middleware
   app.use((err: any, _req: Request, res: Response, _next: NextFunction) => {
     const status = err.status || err.statusCode || 500;
@@ -206,6 +256,16 @@ app.use((req, res, next) => {
       }
     }, 5 * 60 * 1000); // Every 5 minutes
     
+    // Write buffered login tracking (last login time, IP, device) in one batch
+    setInterval(async () => {
+      try {
+        const { flushLoginTracking } = await import('./storage');
+        await flushLoginTracking();
+      } catch (error) {
+        console.error('❌ Error flushing login tracking:', error);
+      }
+    }, 30 * 1000); // Every 30 seconds
+    
     // Auto-setup Telegram webhook on server start with retry logic
     if (process.env.TELEGRAM_BOT_TOKEN) {
       try {
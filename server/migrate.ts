@@ -51,7 +51,7 @@ export async function ensureDatabaseSchema(): Promise<void> {
         last_streak_date TIMESTAMP,
         level INTEGER DEFAULT 1,
         referred_by VARCHAR,
-        referral_code TEXT,
+        referral_code TEXT DEFAULT substr(md5(random()::text || clock_timestamp()::text), 1, 12),
         flagged BOOLEAN DEFAULT false,
         flag_reason TEXT,
         banned BOOLEAN DEFAULT false,
@@ -158,6 +158,16 @@ export async function ensureDatabaseSchema(): Promise<void> {
       console.log('ℹ️ [MIGRATION] Referral code setup complete or already exists');
     }
     
+    // New rows get their 12-char hex code in the INSERT itself instead of a follow-up
+    // UPDATE (core functions only, so this works without pgcrypto)
+    try {
+      await db.execute(sql`
+        ALTER TABLE users ALTER COLUMN referral_code SET DEFAULT substr(md5(random()::text || clock_timestamp()::text), 1, 12)
+      `);
+    } catch (error) {
+      console.log('⚠️ [MIGRATION] Could not set referral_code default:', error);
+    }
+    
     // Earnings table
     await db.execute(sql`
       CREATE TABLE IF NOT EXISTS earnings (
@@ -555,6 +565,32 @@ export async function ensureDatabaseSchema(): Promise<void> {
     await db.execute(sql`CREATE INDEX IF NOT EXISTS idx_withdrawals_user_id ON withdrawals(user_id)`);
     await db.execute(sql`CREATE INDEX IF NOT EXISTS idx_promotions_status ON promotions(status)`);
     await db.execute(sql`CREATE INDEX IF NOT EXISTS idx_task_completions_user_id ON task_completions(user_id)`);
+
+    // Foreign-key / lookup columns that were not covered by a leading index column
+    // (referrer_id, task_id and promotion_id already lead their UNIQUE constraints)
+    await db.execute(sql`CREATE INDEX IF NOT EXISTS idx_referrals_referee_id ON referrals(referee_id)`);
+    await db.execute(sql`CREATE INDEX IF NOT EXISTS idx_referral_commissions_referrer_id ON referral_commissions(referrer_id)`);
+    await db.execute(sql`CREATE INDEX IF NOT EXISTS idx_referral_commissions_referred_user_id ON referral_commissions(referred_user_id)`);
+    await db.execute(sql`CREATE INDEX IF NOT EXISTS idx_transactions_user_id ON transactions(user_id)`);
+    await db.execute(sql`CREATE INDEX IF NOT EXISTS idx_promo_code_usage_code_user ON promo_code_usage(promo_code_id, user_id)`);
+    await db.execute(sql`CREATE INDEX IF NOT EXISTS idx_promo_code_usage_user_id ON promo_code_usage(user_id)`);
+    await db.execute(sql`CREATE INDEX IF NOT EXISTS idx_task_clicks_publisher_id ON task_clicks(publisher_id)`);
+    await db.execute(sql`CREATE INDEX IF NOT EXISTS idx_promotion_claims_user_id ON promotion_claims(user_id)`);
+    await db.execute(sql`CREATE INDEX IF NOT EXISTS idx_advertiser_tasks_advertiser_id ON advertiser_tasks(advertiser_id)`);
+    await db.execute(sql`CREATE INDEX IF NOT EXISTS idx_users_referred_by ON users(referred_by)`);
+    await db.execute(sql`CREATE INDEX IF NOT EXISTS idx_users_device_id ON users(device_id)`);
+
+    // Ad-view counters (referral activation on every ad, withdrawal eligibility) count
+    // a user's ad_watch earnings, optionally since a date - the partial index keeps only
+    // those rows and answers the counts with index-only scans
+    await db.execute(sql`CREATE INDEX IF NOT EXISTS idx_earnings_ad_watch_user_created ON earnings(user_id, created_at) WHERE source = 'ad_watch'`);
+    // Per-user earnings totals over time windows read amount/source straight from the index
+    await db.execute(sql`CREATE INDEX IF NOT EXISTS idx_earnings_user_created_covering ON earnings(user_id, created_at DESC) INCLUDE (amount, source)`);
+    // earnings is append-only, so created_at follows physical order - a BRIN index lets
+    // platform-wide "today"/date-window scans skip old block ranges at a tiny index size
+    await db.execute(sql`CREATE INDEX IF NOT EXISTS idx_earnings_created_at_brin ON earnings USING brin(created_at)`);
+    // Daily reset only touches users with a non-zero counter - keep just those in the index
+    await db.execute(sql`CREATE INDEX IF NOT EXISTS idx_users_ads_watched_today ON users(last_ad_date) WHERE ads_watched_today <> 0`);
     
     console.log('✅ [MIGRATION] All tables and indexes created successfully');
     
@@ -1,6 +1,6 @@
 import type { Express } from "express";
 import { createServer, type Server } from "http";
-import { storage } from "./storage";
+import { storage, DAILY_TASK_TYPES, invalidateUserCache, invalidateUserStatsCache, invalidateAppSettingCache } from "./storage";
 import { WebSocketServer, WebSocket } from 'ws';
 import { 
   insertEarningSchema, 
@@ -20,23 +20,51 @@ import {
   spinHistory,
   dailyMissions
 } from "../shared/schema";
-import { db } from "./db";
+import { db, pool } from "./db";
 import { eq, sql, desc, and, gte } from "drizzle-orm";
 import crypto from "crypto";
-import { sendTelegramMessage, sendUserTelegramNotification, sendWelcomeMessage, handleTelegramMessage, setupTelegramWebhook, verifyChannelMembership, sendSharePhotoToChat } from "./telegram";
+import { sendTelegramMessage, sendUserTelegramNotification, sendWelcomeMessage, enqueueTelegramUpdate, setupTelegramWebhook, verifyChannelMembership, sendSharePhotoToChat, formatWithdrawalMessage } from "./telegram";
 import { authenticateTelegram, requireAuth, optionalAuth } from "./auth";
 import { isAuthenticated } from "./replitAuth";
-import { config, getChannelConfig } from "./config";
+import { config, getChannelConfig, LOG_PAYLOADS, LOG_DEBUG } from "./config";
 
 // Store WebSocket connections for real-time updates
 // Map: sessionId -> { socket: WebSocket, userId: string }
 const connectedUsers = new Map<string, { socket: WebSocket; userId: string }>();
 
+// Payout address formats, compiled once and shared by the wallet routes
+const WALLET_ADDRESS_PATTERNS = {
+  TON: /^(UQ|EQ)[A-Za-z0-9_-]{46}$/,           // TON wallet address (must start with UQ or EQ)
+  USDT: /^0x[a-fA-F0-9]{40}$/,                 // Optimism USDT address (0x... format, 42 characters)
+  STARS: /^@[a-zA-Z0-9_]{1,32}$/,              // Telegram @username
+};
+
+const TELEGRAM_LINK_PATTERN = /t\.me\/([^/?]+)/;
+
+// Telegram Stars withdrawal packages keyed by star count (USD cost before the 5% fee)
+const STAR_PACKAGES = new Map([
+  [15, { stars: 15, usdCost: 0.30 }],
+  [25, { stars: 25, usdCost: 0.50 }],
+  [50, { stars: 50, usdCost: 1.00 }],
+  [100, { stars: 100, usdCost: 2.00 }],
+]);
+
+// Per-method withdrawal config: which user column holds the payout address,
+// the error when it is missing, and the key it is stored under in withdrawal details.
+// Its keys are also the accepted withdrawal methods.
+const WITHDRAWAL_METHODS = new Map<string, {
+  walletField: 'cwalletId' | 'usdtWalletAddress' | 'telegramStarsUsername';
+  missingWalletError: string;
+  detailsKey: string;
+}>([
+  ['TON', { walletField: 'cwalletId', missingWalletError: 'TON address not set', detailsKey: 'tonWalletAddress' }],
+  ['USDT', { walletField: 'usdtWalletAddress', missingWalletError: 'USD address not set', detailsKey: 'usdtWalletAddress' }],
+  ['STARS', { walletField: 'telegramStarsUsername', missingWalletError: 'Telegram username not set', detailsKey: 'telegramUsername' }],
+]);
+
 // Function to verify session token against PostgreSQL sessions table
 async function verifySessionToken(sessionToken: string): Promise<{ isValid: boolean; userId?: string }> {
   try {
-    const { pool } = await import('./db');
-    
     // Query the sessions table to find the session
     const result = await pool.query(
       'SELECT sess, expire FROM sessions WHERE sid = $1',
@@ -109,7 +137,7 @@ function sendRealtimeUpdate(userId: string, update: any) {
     }
   }
   
-  console.log(`📊 Sent real-time update to ${messagesSent} sessions for user ${userId}`);
+  if (LOG_DEBUG) console.log(`📊 Sent real-time update to ${messagesSent} sessions for user ${userId}`);
   return messagesSent > 0;
 }
 
@@ -519,9 +547,10 @@ export async function registerRoutes(app: Express): Promise<Server> {
       
       const isVerified = channelMember && groupMember;
       
-      console.log(`🔍 check-membership for ${telegramId}: channel=${channelMember}, group=${groupMember}, verified=${isVerified}`);
+      if (LOG_DEBUG) console.log(`🔍 check-membership for ${telegramId}: channel=${channelMember}, group=${groupMember}, verified=${isVerified}`);
       
-      // Update user status in database to match current membership state
+      // Update user status in database to match current membership state - the cached
+      // user row may be stale, so always write rather than compare against it
       if (user) {
         await storage.updateUserVerificationStatus(user.id, isVerified);
       }
@@ -612,17 +641,12 @@ export async function registerRoutes(app: Express): Promise<Server> {
       
       // Update user verification status in database
       try {
-        await db.update(users)
-          .set({ 
-            isChannelGroupVerified: isVerified,
-            lastMembershipCheck: new Date()
-          })
-          .where(eq(users.id, sessionUser.id));
+        await storage.updateUserVerificationStatus(sessionUser.id, isVerified);
       } catch (dbError) {
         console.error('⚠️ Could not update user verification status:', dbError);
       }
       
-      console.log(`🔍 Membership check for ${telegramId}: channel=${channelMember}, group=${groupMember}, verified=${isVerified}`);
+      if (LOG_DEBUG) console.log(`🔍 Membership check for ${telegramId}: channel=${channelMember}, group=${groupMember}, verified=${isVerified}`);
       
       res.json({
         success: true,
@@ -647,8 +671,6 @@ export async function registerRoutes(app: Express): Promise<Server> {
   // Debug route to check database columns
   app.get('/api/debug/db-schema', async (req: any, res) => {
     try {
-      const { pool } = await import('./db');
-      
       // Check what columns exist in users table
       const result = await pool.query(`
         SELECT column_name, data_type 
@@ -679,19 +701,19 @@ export async function registerRoutes(app: Express): Promise<Server> {
   app.post('/api/telegram/webhook', async (req: any, res) => {
     try {
       const update = req.body;
-      console.log('📨 Received Telegram update:', JSON.stringify(update, null, 2));
+      console.log('📨 Received Telegram update:', update?.update_id);
+      if (LOG_PAYLOADS) console.log('📨 Update payload:', JSON.stringify(update, null, 2));
       
       // Verify the request is from Telegram (optional but recommended)
       // You can add signature verification here if needed
       
-      const handled = await handleTelegramMessage(update);
-      console.log('✅ Message handled:', handled);
+      // Acknowledge first and process in the background so concurrent updates
+      // are not serialized behind this one
+      res.status(200).json({ ok: true });
       
-      if (handled) {
-        res.status(200).json({ ok: true });
-      } else {
-        res.status(200).json({ ok: true, message: 'No action taken' });
-      }
+      enqueueTelegramUpdate(update)
+        .then((handled) => console.log('✅ Message handled:', handled))
+        .catch((error) => console.error('❌ Telegram webhook processing error:', error));
     } catch (error) {
       console.error('❌ Telegram webhook error:', error);
       res.status(500).json({ error: 'Internal server error' });
@@ -927,9 +949,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
       
       // Ensure referralCode exists
       if (!user.referralCode) {
-        await storage.generateReferralCode(userId);
-        const updatedUser = await storage.getUser(userId);
-        user.referralCode = updatedUser?.referralCode || '';
+        user.referralCode = await storage.generateReferralCode(userId);
       }
       
       // Ensure friendsInvited is properly calculated from COMPLETED referrals only
@@ -953,6 +973,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
           .update(users)
           .set({ friendsInvited: friendsInvited })
           .where(eq(users.id, userId));
+        invalidateUserCache(userId);
       }
       
       // Add referral link with fallback bot username - use /start flow for reliable referral tracking
@@ -1206,14 +1227,16 @@ export async function registerRoutes(app: Express): Promise<Server> {
         }
       }
       
-      // Fetch admin settings for daily limit and reward amount
-      const dailyAdLimitSetting = await db.select().from(adminSettings).where(eq(adminSettings.settingKey, 'daily_ad_limit')).limit(1);
-      const rewardPerAdSetting = await db.select().from(adminSettings).where(eq(adminSettings.settingKey, 'reward_per_ad')).limit(1);
-      const bugRewardPerAdSetting = await db.select().from(adminSettings).where(eq(adminSettings.settingKey, 'bug_reward_per_ad')).limit(1);
+      // Fetch admin settings for daily limit and reward amount (prepared lookups, run concurrently)
+      const [dailyAdLimitSetting, rewardPerAdSetting, bugRewardPerAdSetting] = await Promise.all([
+        storage.getAppSetting('daily_ad_limit', 50),
+        storage.getAppSetting('reward_per_ad', 1000),
+        storage.getAppSetting('bug_reward_per_ad', 1),
+      ]);
       
-      const dailyAdLimit = dailyAdLimitSetting[0]?.settingValue ? parseInt(dailyAdLimitSetting[0].settingValue) : 50;
-      const rewardPerAdPAD = rewardPerAdSetting[0]?.settingValue ? parseInt(rewardPerAdSetting[0].settingValue) : 1000;
-      const bugRewardPerAd = bugRewardPerAdSetting[0]?.settingValue ? parseInt(bugRewardPerAdSetting[0].settingValue) : 1;
+      const dailyAdLimit = parseInt(dailyAdLimitSetting);
+      const rewardPerAdPAD = parseInt(rewardPerAdSetting);
+      const bugRewardPerAd = parseInt(bugRewardPerAdSetting);
       
       // Enforce daily ad limit (configurable, default 50)
       const adsWatchedToday = user.adsWatchedToday || 0;
@@ -1237,18 +1260,9 @@ export async function registerRoutes(app: Express): Promise<Server> {
           description: 'Watched advertisement',
         });
         
-        // Increment ads watched count
-        await storage.incrementAdsWatched(userId);
-        
-        // Add BUG reward for watching ad
+        // Increment ads watched count and add the BUG reward in the same UPDATE
+        await storage.incrementAdsWatched(userId, bugRewardPerAd);
         if (bugRewardPerAd > 0) {
-          await db
-            .update(users)
-            .set({
-              bugBalance: sql`COALESCE(${users.bugBalance}, '0')::numeric + ${bugRewardPerAd}`,
-              updatedAt: new Date()
-            })
-            .where(eq(users.id, userId));
           console.log(`🐛 Added ${bugRewardPerAd} BUG to user ${userId} for ad watch`);
         }
         
@@ -1510,45 +1524,20 @@ export async function registerRoutes(app: Express): Promise<Server> {
           totalUsdEarned: 0
         });
       }
-      const user = await storage.getUser(userId);
-      
-      // Get TOTAL invites (all users invited, regardless of status)
-      const totalInvitesCount = await storage.getTotalInvitesCount(userId);
-      
-      // Get SUCCESSFUL invites (users who watched 1+ ad AND are not banned)
-      const successfulInvitesCount = await storage.getValidReferralCount(userId);
-      
-      // CRITICAL FIX: Calculate from stored historical referral rewards, NOT current admin settings
-      // This ensures admin setting changes do NOT retroactively change past earnings
-      const completedReferrals = await db
-        .select()
-        .from(referrals)
-        .where(and(
-          eq(referrals.referrerId, userId),
-          eq(referrals.status, 'completed')
-        ));
-      
-      // Sum all historical USD rewards stored at time of earning
-      let totalUsdEarned = 0;
-      let totalBugEarned = 0;
-      for (const ref of completedReferrals) {
-        totalUsdEarned += parseFloat(ref.usdRewardAmount || '0');
-        totalBugEarned += parseFloat(ref.bugRewardAmount || '0');
-      }
-      
-      // Fallback to admin settings for pending referrals (not yet earned)
-      // This ensures consistency but doesn't affect already-completed earnings
-      const pendingCount = completedReferrals.length < successfulInvitesCount ? 
-        successfulInvitesCount - completedReferrals.length : 0;
+      // TOTAL invites (all users invited, regardless of status), SUCCESSFUL invites
+      // (completed AND not banned), and reward totals in a single query.
+      // CRITICAL FIX: Rewards are summed from stored historical referral rewards, NOT current
+      // admin settings, so admin setting changes do NOT retroactively change past earnings
+      const stats = await storage.getReferralStats(userId);
       
       res.json({
-        totalInvites: totalInvitesCount,
-        successfulInvites: successfulInvitesCount,
-        totalClaimed: user?.totalClaimedReferralBonus || '0',
-        availableBonus: user?.pendingReferralBonus || '0',
-        readyToClaim: user?.pendingReferralBonus || '0',
-        totalBugEarned: totalBugEarned,
-        totalUsdEarned: totalUsdEarned
+        totalInvites: stats.totalInvites,
+        successfulInvites: stats.successfulInvites,
+        totalClaimed: stats.totalClaimedReferralBonus,
+        availableBonus: stats.pendingReferralBonus,
+        readyToClaim: stats.pendingReferralBonus,
+        totalBugEarned: stats.totalBugEarned,
+        totalUsdEarned: stats.totalUsdEarned
       });
     } catch (error) {
       console.error("Error fetching referral stats:", error);
@@ -1705,15 +1694,18 @@ export async function registerRoutes(app: Express): Promise<Server> {
         return res.status(403).json({ message: "This referral does not belong to you" });
       }
 
-      // Get referral stats
-      const referralEarnings = await storage.getUserStats(referralUser.id);
-      const referralCount = await storage.getUserReferrals(referralUser.id);
+      // Get referral stats - invite count comes from the grouped stats query
+      // instead of loading every referral row just to take its length
+      const [referralEarnings, referralStats] = await Promise.all([
+        storage.getUserStats(referralUser.id),
+        storage.getReferralStats(referralUser.id),
+      ]);
 
       res.json({
         id: searchCode,
         earnedToday: referralEarnings.todayEarnings || "0.00",
         allTime: referralUser.totalEarned || "0.00",
-        invited: referralCount.length,
+        invited: referralStats.totalInvites,
         joinedAt: referralRelationship.createdAt
       });
     } catch (error) {
@@ -1837,6 +1829,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
           .update(users)
           .set({ referralCode })
           .where(eq(users.id, user.id));
+        invalidateUserCache(user.id);
       }
       
       // 5. Get stats for response
@@ -2117,6 +2110,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
           description: 'Share with Friends task completed'
         });
       });
+      invalidateUserCache(userId);
       
       console.log(`🐛 Added ${bugReward} BUG to user ${userId} for share task`);
       
@@ -2294,6 +2288,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
           description: 'Check for Updates task completed'
         });
       });
+      invalidateUserCache(userId);
       
       console.log(`🐛 Added ${bugReward} BUG to user ${userId} for channel task`);
       
@@ -2388,6 +2383,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
           description: 'Join Community task completed'
         });
       });
+      invalidateUserCache(userId);
       
       console.log(`🐛 Added ${bugReward} BUG to user ${userId} for community task`);
       
@@ -2589,7 +2585,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
         // Add non-daily completed tasks (permanently hidden)
         for (const completion of nonDailyCompletions) {
           const task = allTasks.find(t => t.id === completion.promotionId);
-          const isDailyTask = task && ['channel_visit', 'share_link', 'invite_friend', 'ads_goal_mini', 'ads_goal_light', 'ads_goal_medium', 'ads_goal_hard', 'daily'].includes(task.type);
+          const isDailyTask = task && (DAILY_TASK_TYPES.has(task.type) || task.type === 'daily');
           
           if (!isDailyTask) {
             // Only add non-daily tasks to completed set
@@ -2623,7 +2619,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
         .filter(task => !completedIds.has(task.id))
         .map(task => {
           // Extract username from URL for link generation
-          const urlMatch = task.url?.match(/t\.me\/([^/?]+)/);
+          const urlMatch = task.url?.match(TELEGRAM_LINK_PATTERN);
           const username = urlMatch ? urlMatch[1] : null;
           
           let channelPostUrl = null;
@@ -2841,7 +2837,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
       const successfulWithdrawalsCount = await db.select({ count: sql<number>`count(*)` }).from(withdrawals).where(sql`${withdrawals.status} IN ('completed', 'success', 'paid', 'Approved')`);
       const rejectedWithdrawalsCount = await db.select({ count: sql<number>`count(*)` }).from(withdrawals).where(eq(withdrawals.status, 'rejected'));
       const activePromosCount = await db.select({ count: sql<number>`count(*)` }).from(promoCodes).where(eq(promoCodes.isActive, true));
-      const dailyActiveCount = await db.select({ count: sql<number>`count(distinct ${earnings.userId})` }).from(earnings).where(sql`DATE(${earnings.createdAt}) = CURRENT_DATE`);
+      const dailyActiveCount = await db.select({ count: sql<number>`count(distinct ${earnings.userId})` }).from(earnings).where(sql`${earnings.createdAt} >= CURRENT_DATE AND ${earnings.createdAt} < CURRENT_DATE + 1`);
       const totalAdsSum = await db.select({ total: sql<number>`COALESCE(SUM(${users.adsWatched}), 0)` }).from(users);
       const todayAdsSum = await db.select({ total: sql<number>`COALESCE(SUM(${users.adsWatchedToday}), 0)` }).from(users);
       const tonWithdrawnSum = await db.select({ total: sql<string>`COALESCE(SUM(${withdrawals.amount}), '0')` }).from(withdrawals).where(sql`${withdrawals.status} IN ('completed', 'success', 'paid', 'Approved')`);
@@ -2995,6 +2991,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
             ON CONFLICT (setting_key) 
             DO UPDATE SET setting_value = ${value.toString()}, updated_at = NOW()
           `);
+          invalidateAppSettingCache(key);
         }
       };
       
@@ -3076,6 +3073,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
         ON CONFLICT (setting_key) 
         DO UPDATE SET setting_value = ${active ? 'true' : 'false'}, updated_at = NOW()
       `);
+      invalidateAppSettingCache('season_broadcast_active');
       
       res.json({ 
         success: true, 
@@ -3638,13 +3636,24 @@ export async function registerRoutes(app: Express): Promise<Server> {
 
       console.log('🔧 Setting up database schema...');
       
-      // Use drizzle-kit to push schema
-      const { execSync } = await import('child_process');
+      // Use drizzle-kit to push schema - run it as an async child process so the
+      // push doesn't freeze the event loop (and every other request) while it runs
+      const { spawn } = await import('child_process');
       
       try {
-        execSync('npx drizzle-kit push --force', { 
-          stdio: 'inherit',
-          cwd: process.cwd()
+        await new Promise<void>((resolve, reject) => {
+          const child = spawn('npx', ['drizzle-kit', 'push', '--force'], { 
+            stdio: 'inherit',
+            cwd: process.cwd()
+          });
+          child.on('error', reject);
+          child.on('exit', (code) => {
+            if (code === 0) {
+              resolve();
+            } else {
+              reject(new Error(`drizzle-kit push exited with code ${code}`));
+            }
+          });
         });
         
         
@@ -3776,7 +3785,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
         } else {
           // Extract channel username from promotion URL
           const promotion = await storage.getPromotion(promotionId);
-          const channelMatch = promotion?.url?.match(/t\.me\/([^/?]+)/);
+          const channelMatch = promotion?.url?.match(TELEGRAM_LINK_PATTERN);
           const channelName = channelMatch ? channelMatch[1] : 'PaidAdsNews';
           
           const isMember = await verifyChannelMembership(parseInt(telegramUserId), `@${channelName}`, botToken);
@@ -3862,10 +3871,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
       console.log(`🔍 Promotion details:`, { rewardPerUser: promotion.rewardPerUser, type: promotion.type, id: promotion.id });
       
       // Determine if this is a daily task (new task types that reset daily)
-      const isDailyTask = [
-        'channel_visit', 'share_link', 'invite_friend',
-        'ads_goal_mini', 'ads_goal_light', 'ads_goal_medium', 'ads_goal_hard'
-      ].includes(taskType);
+      const isDailyTask = DAILY_TASK_TYPES.has(taskType);
       
       if (isDailyTask) {
         console.log(`💰 Using dynamic reward amount: ${rewardAmount} TON`);
@@ -3993,6 +3999,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
           updatedAt: new Date()
         })
         .where(eq(users.id, userId));
+      invalidateUserCache(userId);
       
       console.log('✅ Wallet details saved successfully');
       
@@ -4032,7 +4039,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
       }
       
       // Validate TON wallet address (must start with UQ or EQ)
-      if (!/^(UQ|EQ)[A-Za-z0-9_-]{46}$/.test(cwalletId.trim())) {
+      if (!WALLET_ADDRESS_PATTERNS.TON.test(cwalletId.trim())) {
         console.log('🚫 Invalid TON wallet address format');
         return res.status(400).json({
           success: false,
@@ -4083,6 +4090,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
           updatedAt: new Date()
         })
         .where(eq(users.id, userId));
+      invalidateUserCache(userId);
       
       console.log('✅ TON wallet address saved successfully');
       
@@ -4124,7 +4132,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
       }
       
       // Validate TON wallet address (must start with UQ or EQ)
-      if (!/^(UQ|EQ)[A-Za-z0-9_-]{46}$/.test(walletId.trim())) {
+      if (!WALLET_ADDRESS_PATTERNS.TON.test(walletId.trim())) {
         console.log('🚫 Invalid TON wallet address format');
         return res.status(400).json({
           success: false,
@@ -4175,6 +4183,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
           updatedAt: new Date()
         })
         .where(eq(users.id, userId));
+      invalidateUserCache(userId);
       
       console.log('✅ Cwallet ID saved permanently via /api/set-wallet');
       
@@ -4217,7 +4226,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
       }
       
       // Validate TON wallet address (must start with UQ or EQ)
-      if (!/^(UQ|EQ)[A-Za-z0-9_-]{46}$/.test(newWalletId.trim())) {
+      if (!WALLET_ADDRESS_PATTERNS.TON.test(newWalletId.trim())) {
         console.log('🚫 Invalid TON wallet address format');
         return res.status(400).json({
           success: false,
@@ -4312,6 +4321,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
           telegramId: user.telegramId
         };
       });
+      invalidateUserCache(userId);
       
       console.log('✅ Wallet changed successfully with fee deduction');
       
@@ -4440,6 +4450,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
           newPadBalance
         };
       });
+      invalidateUserCache(userId);
       
       sendRealtimeUpdate(userId, { type: 'balance_update' });
       
@@ -4542,6 +4553,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
           newTonBalance
         };
       });
+      invalidateUserCache(userId);
       
       sendRealtimeUpdate(userId, {
         type: 'balance_update',
@@ -4649,6 +4661,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
           newBugBalance
         };
       });
+      invalidateUserCache(userId);
       
       sendRealtimeUpdate(userId, {
         type: 'balance_update',
@@ -4695,7 +4708,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
       }
       
       // Validate Optimism USDT address (0x... format, 42 characters)
-      if (!/^0x[a-fA-F0-9]{40}$/.test(usdtAddress.trim())) {
+      if (!WALLET_ADDRESS_PATTERNS.USDT.test(usdtAddress.trim())) {
         return res.status(400).json({
           success: false,
           message: 'Please enter a valid Optimism USDT address'
@@ -4758,6 +4771,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
             updatedAt: new Date()
           })
           .where(eq(users.id, userId));
+        invalidateUserCache(userId);
         
         // Record transaction
         await db.insert(transactions).values({
@@ -4785,6 +4799,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
             updatedAt: new Date()
           })
           .where(eq(users.id, userId));
+        invalidateUserCache(userId);
         
         console.log(`✅ USDT wallet set for user ${userId} (first time - no fee)`);
       }
@@ -4831,7 +4846,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
       }
       
       // Validate username format: @username (letters, numbers, underscores only, no spaces or special chars)
-      if (!/^@[a-zA-Z0-9_]{1,32}$/.test(telegramUsername)) {
+      if (!WALLET_ADDRESS_PATTERNS.STARS.test(telegramUsername)) {
         return res.status(400).json({
           success: false,
           message: 'Invalid username format. Use only letters, numbers, and underscores (e.g., @szxzyz)'
@@ -4877,6 +4892,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
             updatedAt: new Date()
           })
           .where(eq(users.id, userId));
+        invalidateUserCache(userId);
         
         // Record transaction
         await db.insert(transactions).values({
@@ -4904,6 +4920,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
             updatedAt: new Date()
           })
           .where(eq(users.id, userId));
+        invalidateUserCache(userId);
         
         console.log(`✅ Telegram Stars username set for user ${userId}: ${telegramUsername} (first time - no fee)`);
       }
@@ -5074,6 +5091,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
           .update(users)
           .set({ usdBalance: newUSDBalance })
           .where(eq(users.id, userId));
+        invalidateUserCache(userId);
 
         console.log('✅ Payment deducted (USD):', { oldBalance: currentUSDBalance, newBalance: newUSDBalance, deducted: totalCostUSD });
 
@@ -5147,6 +5165,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
           .update(users)
           .set({ tonBalance: newTONBalance, updatedAt: new Date() })
           .where(eq(users.id, userId));
+        invalidateUserCache(userId);
 
         console.log('✅ Payment deducted (TON):', { oldBalance: currentTONBalance, newBalance: newTONBalance, deducted: totalCostTON });
 
@@ -5282,6 +5301,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
           updatedAt: new Date()
         })
         .where(eq(users.id, userId));
+      invalidateUserCache(userId);
 
       // Record the earning
       const task = await storage.getTaskById(taskId);
@@ -5291,6 +5311,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
         source: 'task_completion',
         description: `Completed ${task?.taskType || 'advertiser'} task: ${task?.title || 'Task'}`,
       });
+      invalidateUserStatsCache(userId);
 
       console.log(`✅ Task reward claimed: ${taskId} by ${userId} - Reward: ${rewardPAD} PAD`);
 
@@ -5391,6 +5412,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
           .update(users)
           .set({ usdBalance: newUSDBalance, updatedAt: new Date() })
           .where(eq(users.id, userId));
+        invalidateUserCache(userId);
 
         console.log('✅ Payment deducted (USD):', { oldBalance: currentUSDBalance, newBalance: newUSDBalance, deducted: additionalCost });
       } else {
@@ -5411,6 +5433,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
           .update(users)
           .set({ tonBalance: newTonBalance, updatedAt: new Date() })
           .where(eq(users.id, userId));
+        invalidateUserCache(userId);
 
         console.log('✅ Payment deducted (TON):', { oldBalance: currentTonBalance, newBalance: newTonBalance, deducted: additionalCost });
       }
@@ -5623,6 +5646,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
           }
         }
       });
+      invalidateUserCache(userId);
 
       console.log('✅ Task deleted successfully:', taskId);
 
@@ -5657,7 +5681,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
       }
 
       // Extract channel username
-      const match = channelLink.match(/t\.me\/([^/?]+)/);
+      const match = channelLink.match(TELEGRAM_LINK_PATTERN);
       if (!match || !match[1]) {
         return res.status(400).json({
           success: false,
@@ -5836,8 +5860,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
       console.log('📝 Withdrawal request received:', { userId, method, starPackage, withdrawalPackage });
 
       // Validate withdrawal method
-      const validMethods = ['TON', 'USDT', 'STARS'];
-      if (!method || !validMethods.includes(method)) {
+      if (!method || !WITHDRAWAL_METHODS.has(method)) {
         return res.status(400).json({
           success: false,
           message: 'Invalid withdrawal method'
@@ -6059,25 +6082,14 @@ export async function registerRoutes(app: Express): Promise<Server> {
         }
 
         // Check if user has appropriate wallet address based on method
-        let walletAddress: string;
-        if (method === 'TON') {
-          if (!user.cwalletId) {
-            throw new Error('TON address not set');
-          }
-          walletAddress = user.cwalletId;
-        } else if (method === 'USD' || method === 'USDT') {
-          if (!user.usdtWalletAddress) {
-            throw new Error('USD address not set');
-          }
-          walletAddress = user.usdtWalletAddress;
-        } else if (method === 'STARS') {
-          if (!user.telegramStarsUsername) {
-            throw new Error('Telegram username not set');
-          }
-          walletAddress = user.telegramStarsUsername;
-        } else {
+        const methodConfig = WITHDRAWAL_METHODS.get(method);
+        if (!methodConfig) {
           throw new Error('Invalid withdrawal method');
         }
+        const walletAddress = user[methodConfig.walletField];
+        if (!walletAddress) {
+          throw new Error(methodConfig.missingWalletError);
+        }
 
         const currentUsdBalance = parseFloat(user.usdBalance || '0');
         
@@ -6125,14 +6137,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
             throw new Error('Star package selection is required for Telegram Stars withdrawal');
           }
           
-          const starPackages = [
-            { stars: 15, usdCost: 0.30 },
-            { stars: 25, usdCost: 0.50 },
-            { stars: 50, usdCost: 1.00 },
-            { stars: 100, usdCost: 2.00 }
-          ];
-          
-          const selectedPkg = starPackages.find(p => p.stars === starPackage);
+          const selectedPkg = STAR_PACKAGES.get(starPackage);
           if (!selectedPkg) {
             throw new Error('Invalid star package selected');
           }
@@ -6147,7 +6152,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
           usdToDeduct = totalCost;
           withdrawalDetails.starPackage = starPackage;
           withdrawalDetails.stars = starPackage;
-          withdrawalDetails.telegramUsername = walletAddress;
+          withdrawalDetails[methodConfig.detailsKey] = walletAddress;
         } else {
           // TON or USD withdrawal - package-based or FULL balance
           if (currentUsdBalance <= 0) {
@@ -6184,11 +6189,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
           withdrawalDetails.bugDeducted = minimumBugForWithdrawal;
           
           // Store wallet address based on method
-          if (method === 'TON') {
-            withdrawalDetails.tonWalletAddress = walletAddress;
-          } else if (method === 'USD' || method === 'USDT') {
-            withdrawalDetails.usdtWalletAddress = walletAddress;
-          }
+          withdrawalDetails[methodConfig.detailsKey] = walletAddress;
         }
 
         console.log(`📝 Creating withdrawal request for $${withdrawalAmount.toFixed(2)} USD via ${method} (balance will be deducted on approval)`);
@@ -6251,17 +6252,16 @@ export async function registerRoutes(app: Express): Promise<Server> {
       const feeAmount = newWithdrawal.fee;
       const feePercent = newWithdrawal.feePercent;
       
-      const adminMessage = `💰 Withdrawal Request
-
-🗣 User: <a href="tg://user?id=${userTelegramId}">${userName}</a>
-🆔 User ID: ${userTelegramId}
-💳 Username: ${userTelegramUsername}
-🌐 Address:
-${walletAddress}
-💸 Amount: ${newWithdrawal.withdrawnAmount.toFixed(5)} USD
-🛂 Fee: ${feeAmount.toFixed(5)} (${feePercent}%)
-📅 Date: ${currentDate}
-🤖 Bot: @MoneyAdzbot`;
+      const adminMessage = formatWithdrawalMessage('💰 Withdrawal Request', {
+        userTelegramId,
+        userName,
+        username: userTelegramUsername,
+        walletAddress,
+        amount: newWithdrawal.withdrawnAmount,
+        fee: feeAmount,
+        feePercent,
+        date: currentDate
+      });
 
       // Create inline keyboard with Approve and Reject buttons
       const inlineKeyboard = {
@@ -6290,18 +6290,8 @@ ${walletAddress}
       // Send notification to PaidAdzGroup for withdrawal requests (same format as admin notification)
       if (process.env.TELEGRAM_BOT_TOKEN) {
         const PAIDADZ_GROUP_CHAT_ID = '-1003402950172';
-        // Use the exact same format as admin message
-        const groupMessage = `💰 Withdrawal Request
-
-🗣 User: <a href="tg://user?id=${userTelegramId}">${userName}</a>
-🆔 User ID: ${userTelegramId}
-💳 Username: ${userTelegramUsername}
-🌐 Address:
-${walletAddress}
-💸 Amount: ${newWithdrawal.withdrawnAmount.toFixed(5)} USD
-🛂 Fee: ${feeAmount.toFixed(5)} (${feePercent}%)
-📅 Date: ${currentDate}
-🤖 Bot: @MoneyAdzbot`;
+        // Reuse the already rendered admin message
+        const groupMessage = adminMessage;
 
         fetch(`https://api.telegram.org/bot${process.env.TELEGRAM_BOT_TOKEN}/sendMessage`, {
           method: 'POST',
@@ -6483,6 +6473,7 @@ ${walletAddress}
         
         return { withdrawal, withdrawnAmount: currentTonBalance };
       });
+      invalidateUserCache(userId);
 
       console.log(`✅ Withdrawal via /api/withdraw: ${result.withdrawnAmount} TON`);
 
@@ -6937,22 +6928,23 @@ ${walletAddress}
       const userId = req.user.user.id;
       const currentDate = new Date().toISOString().split('T')[0];
       
-      // Get current user data
-      const user = await storage.getUser(userId);
-      if (!user) {
-        return res.status(404).json({ message: 'User not found' });
-      }
-      
-      const currentAds = (user.adsWatchedToday || 0) + 1;
-      
-      // Update user's ads watched count
-      await db.update(users)
+      // Increment the ad counters in SQL so concurrent increments (here or in
+      // storage.incrementAdsWatched) can't overwrite each other
+      const [updated] = await db.update(users)
         .set({ 
-          adsWatchedToday: currentAds,
-          adsWatched: (user.adsWatched || 0) + 1,
+          adsWatchedToday: sql`COALESCE(${users.adsWatchedToday}, 0) + 1`,
+          adsWatched: sql`COALESCE(${users.adsWatched}, 0) + 1`,
           lastAdWatch: new Date()
         })
-        .where(eq(users.id, userId));
+        .where(eq(users.id, userId))
+        .returning({ adsWatchedToday: users.adsWatchedToday });
+      
+      if (!updated) {
+        return res.status(404).json({ message: 'User not found' });
+      }
+      invalidateUserCache(userId);
+      
+      const currentAds = updated.adsWatchedToday || 0;
       
       // Update all ads goal tasks progress
       const adsGoals = ['ads_mini', 'ads_light', 'ads_medium', 'ads_hard'];
@@ -7004,6 +6996,7 @@ ${walletAddress}
       await db.update(users)
         .set({ friendInvited: true })
         .where(eq(users.id, userId));
+      invalidateUserCache(userId);
       
       // Update daily task completion
       await db.update(dailyTasks)
@@ -7162,6 +7155,7 @@ ${walletAddress}
           .update(users)
           .set({ tonBalance: newTonBalance, updatedAt: new Date() })
           .where(eq(users.id, userId));
+        invalidateUserCache(userId);
         
         // Log transaction for tracking
         await storage.logTransaction({
@@ -7203,6 +7197,7 @@ ${walletAddress}
           .update(users)
           .set({ bugBalance: newBugBalance, updatedAt: new Date() })
           .where(eq(users.id, userId));
+        invalidateUserCache(userId);
         
         // Log transaction for tracking
         await storage.logTransaction({
@@ -7450,6 +7445,7 @@ ${walletAddress}
             tonBalance: newTon.toString(),
             updatedAt: new Date(),
           }).where(eq(users.id, userId));
+          invalidateUserCache(userId);
 
           // Record transaction
           await db.insert(transactions).values({
@@ -7558,11 +7554,11 @@ ${walletAddress}
     { type: 'TON', amount: 0.01, rarity: 'rare', weight: 5 },       // VERY LOW CHANCE
     { type: 'TON', amount: 0.10, rarity: 'ultra_rare', weight: 1 }, // EXTREMELY LOW CHANCE
   ];
+  const SPIN_TOTAL_WEIGHT = SPIN_REWARDS.reduce((sum, r) => sum + r.weight, 0);
 
   // Weighted random selection
   const selectSpinReward = () => {
-    const totalWeight = SPIN_REWARDS.reduce((sum, r) => sum + r.weight, 0);
-    let random = Math.random() * totalWeight;
+    let random = Math.random() * SPIN_TOTAL_WEIGHT;
     
     for (const reward of SPIN_REWARDS) {
       random -= reward.weight;
@@ -7722,6 +7718,7 @@ ${walletAddress}
           balance: newBalance.toString(),
           updatedAt: new Date(),
         }).where(eq(users.id, userId));
+        invalidateUserCache(userId);
       } else if (reward.type === 'TON') {
         const currentTon = parseFloat(user.tonBalance?.toString() || '0');
         const newTon = currentTon + reward.amount;
@@ -7729,6 +7726,7 @@ ${walletAddress}
           tonBalance: newTon.toString(),
           updatedAt: new Date(),
         }).where(eq(users.id, userId));
+        invalidateUserCache(userId);
       }
 
       // Record spin history
@@ -7991,6 +7989,7 @@ ${walletAddress}
           balance: (currentBalance + reward).toString(),
           updatedAt: new Date(),
         }).where(eq(users.id, userId));
+        invalidateUserCache(userId);
       }
 
       // Record transaction
@@ -8061,6 +8060,7 @@ ${walletAddress}
           balance: (currentBalance + reward).toString(),
           updatedAt: new Date(),
         }).where(eq(users.id, userId));
+        invalidateUserCache(userId);
       }
 
       // Record transaction
@@ -8131,6 +8131,7 @@ ${walletAddress}
           balance: (currentBalance + reward).toString(),
           updatedAt: new Date(),
         }).where(eq(users.id, userId));
+        invalidateUserCache(userId);
       }
 
       // Record transaction
@@ -36,6 +36,160 @@ import {
 import { db } from "./db";
 import { eq, desc, and, gte, lt, sql } from "drizzle-orm";
 import crypto from "crypto";
+import { TTLCache } from "./cache";
+import { LOG_DEBUG } from "./config";
+
+// Short-lived user lookup cache - bot/auth flows resolve the same user several times
+// per interaction. Entries are dropped on writes via invalidateUserCache(), and rows
+// are copied in and out so a caller mutating its user never touches the cache.
+const userByTelegramIdCache = new TTLCache<string, User>(10000, 30 * 1000);
+// Reverse index so invalidation by user id is a single delete, not a cache scan
+// (sized larger so it never evicts an id whose row is still cached)
+const telegramIdByUserIdCache = new TTLCache<string, string>(20000, 30 * 1000);
+// Referral codes never change once assigned, so only the code -> user id mapping is
+// kept long-term; the row itself is always read fresh by primary key
+const userIdByReferralCodeCache = new TTLCache<string, string>(10000, 5 * 60 * 1000);
+
+function cacheUserByTelegramId(telegramId: string, user: User): void {
+  userByTelegramIdCache.set(telegramId, { ...user });
+  telegramIdByUserIdCache.set(user.id, telegramId);
+}
+
+export function invalidateUserCache(userId: string): void {
+  const telegramId = telegramIdByUserIdCache.get(userId);
+  if (telegramId) {
+    userByTelegramIdCache.delete(telegramId);
+    telegramIdByUserIdCache.delete(userId);
+  }
+}
+
+// Bulk writes (daily resets) touch arbitrary users - drop every cached row
+function clearUserCache(): void {
+  userByTelegramIdCache.clear();
+  telegramIdByUserIdCache.clear();
+}
+
+// 48 random bits almost never collide; the unique constraint catches the rare case
+const REFERRAL_CODE_ATTEMPTS = 3;
+
+// Earnings windows for the dashboard/referral views - dropped whenever the user earns
+type UserStats = { todayEarnings: string; weekEarnings: string; monthEarnings: string; totalEarnings: string };
+const userStatsCache = new TTLCache<string, UserStats>(10000, 30 * 1000);
+
+export function invalidateUserStatsCache(userId: string): void {
+  userStatsCache.delete(userId);
+}
+
+// Admin settings are read on nearly every earning/withdrawal path but change rarely;
+// null marks a key with no stored value so the default is used without a query
+const appSettingCache = new TTLCache<string, string | null>(500, 60 * 1000);
+
+export function invalidateAppSettingCache(key?: string): void {
+  if (key) {
+    appSettingCache.delete(key);
+  } else {
+    appSettingCache.clear();
+  }
+}
+
+// Login tracking (IP, user agent, device, app version) is rewritten on every
+// authenticated Mini App request. Keep only the latest values per user and write
+// them in one multi-row UPDATE from flushLoginTracking() on a timer.
+export interface LoginTracking {
+  lastLoginAt: Date;
+  lastLoginIp?: string;
+  lastLoginUserAgent?: string;
+  lastLoginDevice?: string;
+  appVersion?: string;
+  browserFingerprint?: string;
+}
+
+// Rows per UPDATE (7 bind parameters each, well under Postgres' 65535 limit), the most
+// users buffered at once, and how many failed flushes an entry survives before it is dropped
+const LOGIN_TRACKING_CHUNK_SIZE = 1000;
+const LOGIN_TRACKING_MAX_PENDING = 50000;
+const LOGIN_TRACKING_MAX_ATTEMPTS = 3;
+
+const pendingLoginTracking = new Map<string, { tracking: LoginTracking; failures: number }>();
+
+export function recordLoginTracking(userId: string, tracking: LoginTracking): void {
+  // Login metadata is best-effort - when the buffer is full, new users wait for the next request
+  if (pendingLoginTracking.size >= LOGIN_TRACKING_MAX_PENDING && !pendingLoginTracking.has(userId)) {
+    return;
+  }
+  pendingLoginTracking.set(userId, { tracking, failures: 0 });
+}
+
+export async function flushLoginTracking(): Promise<void> {
+  if (pendingLoginTracking.size === 0) return;
+
+  const batch = Array.from(pendingLoginTracking.entries());
+  pendingLoginTracking.clear();
+
+  for (let i = 0; i < batch.length; i += LOGIN_TRACKING_CHUNK_SIZE) {
+    const chunk = batch.slice(i, i + LOGIN_TRACKING_CHUNK_SIZE);
+
+    const rows = sql.join(chunk.map(([userId, { tracking: t }]) => sql`(
+      ${userId},
+      ${t.lastLoginAt.toISOString()},
+      ${t.lastLoginIp ?? null},
+      ${t.lastLoginUserAgent ?? null},
+      ${t.lastLoginDevice ?? null},
+      ${t.appVersion ?? null},
+      ${t.browserFingerprint ?? null}
+    )`), sql`, `);
+
+    try {
+      // Missing values keep the stored column, matching an UPDATE that omits them;
+      // GREATEST keeps a late (requeued) flush from moving timestamps backwards
+      await db.execute(sql`
+        UPDATE users SET
+          last_login_at = GREATEST(users.last_login_at, v.last_login_at::timestamp),
+          last_login_ip = COALESCE(v.last_login_ip, users.last_login_ip),
+          last_login_user_agent = COALESCE(v.last_login_user_agent, users.last_login_user_agent),
+          last_login_device = COALESCE(v.last_login_device, users.last_login_device),
+          app_version = COALESCE(v.app_version, users.app_version),
+          browser_fingerprint = COALESCE(v.browser_fingerprint, users.browser_fingerprint),
+          updated_at = GREATEST(users.updated_at, v.last_login_at::timestamp)
+        FROM (VALUES ${rows}) AS v(id, last_login_at, last_login_ip, last_login_user_agent, last_login_device, app_version, browser_fingerprint)
+        WHERE users.id = v.id
+      `);
+    } catch (error) {
+      console.error(`⚠️ Failed to flush login tracking for ${chunk.length} users:`, error);
+      // Requeue for the next flush, unless a newer login was recorded in the meantime
+      // or the entry has already failed too often
+      for (const [userId, entry] of chunk) {
+        const failures = entry.failures + 1;
+        if (failures < LOGIN_TRACKING_MAX_ATTEMPTS && !pendingLoginTracking.has(userId)) {
+          pendingLoginTracking.set(userId, { tracking: entry.tracking, failures });
+        }
+      }
+    }
+  }
+}
+
+// Named prepared statements for the hottest user lookups - node-postgres prepares
+// each name once per pooled connection, so Postgres skips parse/plan on reuse
+const getUserByIdStmt = db.select().from(users)
+  .where(eq(users.id, sql.placeholder('id')))
+  .limit(1)
+  .prepare('get_user_by_id');
+
+const getUserByTelegramIdStmt = db.select().from(users)
+  .where(eq(users.telegram_id, sql.placeholder('telegramId')))
+  .limit(1)
+  .prepare('get_user_by_telegram_id');
+
+const getUserByReferralCodeStmt = db.select().from(users)
+  .where(eq(users.referralCode, sql.placeholder('referralCode')))
+  .limit(1)
+  .prepare('get_user_by_referral_code');
+
+const getAppSettingStmt = db.select({ settingValue: adminSettings.settingValue })
+  .from(adminSettings)
+  .where(eq(adminSettings.settingKey, sql.placeholder('key')))
+  .limit(1)
+  .prepare('get_app_setting');
 
 // Payment system configuration
 export interface PaymentSystem {
@@ -53,6 +207,21 @@ export const PAYMENT_SYSTEMS: PaymentSystem[] = [
   { id: 'litecoin', name: 'Litecoin', emoji: '⏺', minWithdrawal: 0.35, fee: 0.0 }
 ];
 
+// Indexed by id for O(1) lookup on the payout path
+const PAYMENT_SYSTEMS_BY_ID = new Map(PAYMENT_SYSTEMS.map(p => [p.id, p]));
+
+// Task types that reset every day (tracked per period date instead of once)
+export const DAILY_TASK_TYPES = new Set([
+  'channel_visit', 'share_link', 'invite_friend',
+  'ads_goal_mini', 'ads_goal_light', 'ads_goal_medium', 'ads_goal_hard'
+]);
+
+// Minimum/fee messages only depend on the static config above, so build them once
+const PAYMENT_SYSTEM_MESSAGES = new Map(PAYMENT_SYSTEMS.map(p => [p.id, {
+  belowMinimum: `Minimum withdrawal is ${p.minWithdrawal} ${p.name}`,
+  belowFee: `Withdrawal amount must be greater than the fee of ${p.fee} ${p.name}`,
+}]));
+
 // Interface for storage operations
 export interface IStorage {
   // User operations (mandatory for Replit Auth)
@@ -76,7 +245,7 @@ export interface IStorage {
   updateUserStreak(userId: string): Promise<{ newStreak: number; rewardEarned: string }>;
   
   // Ads tracking
-  incrementAdsWatched(userId: string): Promise<void>;
+  incrementAdsWatched(userId: string, bugReward?: number): Promise<void>;
   incrementExtraAdsWatched(userId: string): Promise<void>;
   resetDailyAdsCount(userId: string): Promise<void>;
   canWatchAd(userId: string): Promise<boolean>;
@@ -94,6 +263,15 @@ export interface IStorage {
   // Referral operations
   createReferral(referrerId: string, referredId: string): Promise<Referral>;
   getUserReferrals(userId: string): Promise<Referral[]>;
+  getReferralStats(userId: string): Promise<{
+    totalInvites: number;
+    successfulInvites: number;
+    completedReferrals: number;
+    totalUsdEarned: number;
+    totalBugEarned: number;
+    totalClaimedReferralBonus: string;
+    pendingReferralBonus: string;
+  }>;
   
   // Generate referral code
   generateReferralCode(userId: string): Promise<string>;
@@ -133,7 +311,7 @@ export interface IStorage {
 export class DatabaseStorage implements IStorage {
   // User operations (mandatory for Replit Auth)
   async getUser(id: string): Promise<User | undefined> {
-    const [user] = await db.select().from(users).where(eq(users.id, id));
+    const [user] = await getUserByIdStmt.execute({ id });
     return user;
   }
 
@@ -144,15 +322,16 @@ export class DatabaseStorage implements IStorage {
         lastMembershipCheck: new Date()
       })
       .where(eq(users.id, userId));
+    invalidateUserCache(userId);
   }
 
   async getUserByTelegramId(telegramId: string): Promise<User | undefined> {
+    const cached = userByTelegramIdCache.get(telegramId);
+    if (cached) return { ...cached };
+
     try {
-      // Use raw SQL to avoid Drizzle ORM issues
-      const result = await db.execute(sql`
-        SELECT * FROM users WHERE telegram_id = ${telegramId} LIMIT 1
-      `);
-      const user = result.rows[0] as User | undefined;
+      const [user] = await getUserByTelegramIdStmt.execute({ telegramId });
+      if (user) cacheUserByTelegramId(telegramId, user);
       return user;
     } catch (error) {
       console.error('Error in getUserByTelegramId:', error);
@@ -223,24 +402,26 @@ export class DatabaseStorage implements IStorage {
     
     // If not found by telegram_id, check if user exists by personal_code (for migration scenarios)
     if (!existingUser && sanitizedData.personalCode) {
-      const result = await db.execute(sql`
-        SELECT * FROM users WHERE personal_code = ${sanitizedData.personalCode} LIMIT 1
-      `);
-      const userByPersonalCode = result.rows[0] as User | undefined;
+      const [userByPersonalCode] = await db
+        .select({ id: users.id })
+        .from(users)
+        .where(eq(users.personalCode, sanitizedData.personalCode))
+        .limit(1);
       
       if (userByPersonalCode) {
         // User exists but doesn't have telegram_id set - update it
-        const updateResult = await db.execute(sql`
-          UPDATE users 
-          SET telegram_id = ${telegramId},
-              first_name = ${sanitizedData.firstName}, 
-              last_name = ${sanitizedData.lastName}, 
-              username = ${sanitizedData.username},
-              updated_at = NOW()
-          WHERE personal_code = ${sanitizedData.personalCode}
-          RETURNING *
-        `);
-        const user = updateResult.rows[0] as User;
+        const [user] = await db
+          .update(users)
+          .set({
+            telegram_id: telegramId,
+            firstName: sanitizedData.firstName,
+            lastName: sanitizedData.lastName,
+            username: sanitizedData.username,
+            updatedAt: new Date(),
+          })
+          .where(eq(users.id, userByPersonalCode.id))
+          .returning();
+        cacheUserByTelegramId(telegramId, user);
         return { user, isNewUser: false };
       }
     }
@@ -249,28 +430,25 @@ export class DatabaseStorage implements IStorage {
     
     if (existingUser) {
       // For existing users, update fields and ensure referral code exists
-      const result = await db.execute(sql`
-        UPDATE users 
-        SET first_name = ${sanitizedData.firstName}, 
-            last_name = ${sanitizedData.lastName}, 
-            username = ${sanitizedData.username},
-            updated_at = NOW()
-        WHERE telegram_id = ${telegramId}
-        RETURNING *
-      `);
-      const user = result.rows[0] as User;
+      const [user] = await db
+        .update(users)
+        .set({
+          firstName: sanitizedData.firstName,
+          lastName: sanitizedData.lastName,
+          username: sanitizedData.username,
+          updatedAt: new Date(),
+        })
+        .where(eq(users.telegram_id, telegramId))
+        .returning();
+      cacheUserByTelegramId(telegramId, user);
       
       // Ensure existing user has referral code
       if (!user.referralCode) {
         console.log('🔄 Generating missing referral code for existing user:', user.id);
         try {
-          await this.generateReferralCode(user.id);
-          // Fetch updated user with referral code
-          const updatedUser = await this.getUser(user.id);
-          return { user: updatedUser || user, isNewUser };
+          user.referralCode = await this.generateReferralCode(user.id);
         } catch (error) {
           console.error('Failed to generate referral code for existing user:', error);
-          return { user, isNewUser };
         }
       }
       
@@ -281,28 +459,33 @@ export class DatabaseStorage implements IStorage {
       let finalEmail = userData.email;
       try {
         // Try to create with the provided email first
-        const result = await db.execute(sql`
-          INSERT INTO users (
-            telegram_id, email, first_name, last_name, username, personal_code, 
-            withdraw_balance, total_earnings, ads_watched, daily_ads_watched, 
-            daily_earnings, level, flagged, banned
-          )
-          VALUES (
-            ${telegramId}, ${finalEmail}, ${sanitizedData.firstName}, ${sanitizedData.lastName}, 
-            ${sanitizedData.username}, ${sanitizedData.personalCode}, ${sanitizedData.withdrawBalance}, 
-            ${sanitizedData.totalEarnings}, ${sanitizedData.adsWatched}, ${sanitizedData.dailyAdsWatched}, 
-            ${sanitizedData.dailyEarnings}, ${sanitizedData.level}, ${sanitizedData.flagged}, 
-            ${sanitizedData.banned}
-          )
-          RETURNING *
-        `);
-        const user = result.rows[0] as User;
+        const [user] = await db
+          .insert(users)
+          .values({
+            telegram_id: telegramId,
+            email: finalEmail,
+            firstName: sanitizedData.firstName,
+            lastName: sanitizedData.lastName,
+            username: sanitizedData.username,
+            personalCode: sanitizedData.personalCode,
+            withdrawBalance: sanitizedData.withdrawBalance,
+            totalEarnings: sanitizedData.totalEarnings,
+            adsWatched: sanitizedData.adsWatched,
+            dailyAdsWatched: sanitizedData.dailyAdsWatched,
+            dailyEarnings: sanitizedData.dailyEarnings,
+            level: sanitizedData.level,
+            flagged: sanitizedData.flagged,
+            banned: sanitizedData.banned,
+          })
+          .returning();
         
-        // Auto-generate referral code for new users
-        try {
-          await this.generateReferralCode(user.id);
-        } catch (error) {
-          console.error('Failed to generate referral code for new Telegram user:', error);
+        // referral_code is filled by the column default; only fall back when it is missing
+        if (!user.referralCode) {
+          try {
+            user.referralCode = await this.generateReferralCode(user.id);
+          } catch (error) {
+            console.error('Failed to generate referral code for new Telegram user:', error);
+          }
         }
         
         // Auto-create balance record for new users
@@ -313,9 +496,7 @@ export class DatabaseStorage implements IStorage {
           console.error('Failed to create balance record for new Telegram user:', error);
         }
         
-        // Fetch updated user with referral code
-        const updatedUser = await this.getUser(user.id);
-        return { user: updatedUser || user, isNewUser };
+        return { user, isNewUser };
       } catch (error: any) {
         // Handle unique constraint violations
         if (error.code === '23505') {
@@ -327,28 +508,33 @@ export class DatabaseStorage implements IStorage {
           }
           
           // Try again with modified data
-          const result = await db.execute(sql`
-            INSERT INTO users (
-              telegram_id, email, first_name, last_name, username, personal_code, 
-              withdraw_balance, total_earnings, ads_watched, daily_ads_watched, 
-              daily_earnings, level, flagged, banned
-            )
-            VALUES (
-              ${telegramId}, ${finalEmail}, ${sanitizedData.firstName}, ${sanitizedData.lastName}, 
-              ${sanitizedData.username}, ${sanitizedData.personalCode}, ${sanitizedData.withdrawBalance}, 
-              ${sanitizedData.totalEarnings}, ${sanitizedData.adsWatched}, ${sanitizedData.dailyAdsWatched}, 
-              ${sanitizedData.dailyEarnings}, ${sanitizedData.level}, ${sanitizedData.flagged}, 
-              ${sanitizedData.banned}
-            )
-            RETURNING *
-          `);
-          const user = result.rows[0] as User;
+          const [user] = await db
+            .insert(users)
+            .values({
+              telegram_id: telegramId,
+              email: finalEmail,
+              firstName: sanitizedData.firstName,
+              lastName: sanitizedData.lastName,
+              username: sanitizedData.username,
+              personalCode: sanitizedData.personalCode,
+              withdrawBalance: sanitizedData.withdrawBalance,
+              totalEarnings: sanitizedData.totalEarnings,
+              adsWatched: sanitizedData.adsWatched,
+              dailyAdsWatched: sanitizedData.dailyAdsWatched,
+              dailyEarnings: sanitizedData.dailyEarnings,
+              level: sanitizedData.level,
+              flagged: sanitizedData.flagged,
+              banned: sanitizedData.banned,
+            })
+            .returning();
           
-          // Auto-generate referral code for new users
-          try {
-            await this.generateReferralCode(user.id);
-          } catch (error) {
-            console.error('Failed to generate referral code for new Telegram user:', error);
+          // referral_code is filled by the column default; only fall back when it is missing
+          if (!user.referralCode) {
+            try {
+              user.referralCode = await this.generateReferralCode(user.id);
+            } catch (error) {
+              console.error('Failed to generate referral code for new Telegram user:', error);
+            }
           }
           
           // Auto-create balance record for new users
@@ -359,9 +545,7 @@ export class DatabaseStorage implements IStorage {
             console.error('Failed to create balance record for new Telegram user:', error);
           }
           
-          // Fetch updated user with referral code
-          const updatedUser = await this.getUser(user.id);
-          return { user: updatedUser || user, isNewUser };
+          return { user, isNewUser };
         } else {
           throw error;
         }
@@ -376,7 +560,7 @@ export class DatabaseStorage implements IStorage {
       .values(transaction)
       .returning();
     
-    console.log(`📊 Transaction recorded: ${transaction.type} of $${transaction.amount} for user ${transaction.userId} - ${transaction.source}`);
+    if (LOG_DEBUG) console.log(`📊 Transaction recorded: ${transaction.type} of $${transaction.amount} for user ${transaction.userId} - ${transaction.source}`);
     return newTransaction;
   }
 
@@ -391,6 +575,7 @@ export class DatabaseStorage implements IStorage {
       .insert(earnings)
       .values(earning)
       .returning();
+    invalidateUserStatsCache(earning.userId);
     
     // Log transaction for security and tracking
     await this.logTransaction({
@@ -450,6 +635,7 @@ export class DatabaseStorage implements IStorage {
             updatedAt: new Date(),
           })
           .where(eq(users.id, earning.userId));
+        invalidateUserCache(earning.userId);
       } catch (userUpdateError) {
         console.error('Error updating users table in addEarning:', userUpdateError);
         // Don't throw - the earning was already recorded
@@ -487,52 +673,20 @@ export class DatabaseStorage implements IStorage {
     monthEarnings: string;
     totalEarnings: string;
   }> {
+    const cached = userStatsCache.get(userId);
+    if (cached) return { ...cached };
+
     const now = new Date();
     const today = new Date(now.getFullYear(), now.getMonth(), now.getDate());
     const weekAgo = new Date(today.getTime() - 7 * 24 * 60 * 60 * 1000);
     const monthAgo = new Date(today.getFullYear(), today.getMonth() - 1, today.getDate());
 
-    const [todayResult] = await db
-      .select({
-        total: sql<string>`COALESCE(SUM(${earnings.amount}), 0)`,
-      })
-      .from(earnings)
-      .where(
-        and(
-          eq(earnings.userId, userId),
-          gte(earnings.createdAt, today),
-          sql`${earnings.source} <> 'withdrawal'`
-        )
-      );
-
-    const [weekResult] = await db
-      .select({
-        total: sql<string>`COALESCE(SUM(${earnings.amount}), 0)`,
-      })
-      .from(earnings)
-      .where(
-        and(
-          eq(earnings.userId, userId),
-          gte(earnings.createdAt, weekAgo),
-          sql`${earnings.source} <> 'withdrawal'`
-        )
-      );
-
-    const [monthResult] = await db
-      .select({
-        total: sql<string>`COALESCE(SUM(${earnings.amount}), 0)`,
-      })
-      .from(earnings)
-      .where(
-        and(
-          eq(earnings.userId, userId),
-          gte(earnings.createdAt, monthAgo),
-          sql`${earnings.source} <> 'withdrawal'`
-        )
-      );
-
-    const [totalResult] = await db
+    // One pass over the user's earnings - each window is a FILTER on the same SUM
+    const [result] = await db
       .select({
+        today: sql<string>`COALESCE(SUM(${earnings.amount}) FILTER (WHERE ${gte(earnings.createdAt, today)}), 0)`,
+        week: sql<string>`COALESCE(SUM(${earnings.amount}) FILTER (WHERE ${gte(earnings.createdAt, weekAgo)}), 0)`,
+        month: sql<string>`COALESCE(SUM(${earnings.amount}) FILTER (WHERE ${gte(earnings.createdAt, monthAgo)}), 0)`,
         total: sql<string>`COALESCE(SUM(${earnings.amount}), 0)`,
       })
       .from(earnings)
@@ -543,12 +697,14 @@ export class DatabaseStorage implements IStorage {
         )
       );
 
-    return {
-      todayEarnings: todayResult.total,
-      weekEarnings: weekResult.total,
-      monthEarnings: monthResult.total,
-      totalEarnings: totalResult.total,
+    const stats = {
+      todayEarnings: result.today,
+      weekEarnings: result.week,
+      monthEarnings: result.month,
+      totalEarnings: result.total,
     };
+    userStatsCache.set(userId, { ...stats });
+    return stats;
   }
 
   async updateUserBalance(userId: string, amount: string): Promise<void> {
@@ -580,35 +736,42 @@ export class DatabaseStorage implements IStorage {
   }
 
   async updateUserStreak(userId: string): Promise<{ newStreak: number; rewardEarned: string; isBonusDay: boolean }> {
-    const [user] = await db.select().from(users).where(eq(users.id, userId));
-    
-    if (!user) {
-      throw new Error("User not found");
-    }
-
     const now = new Date();
-    const lastStreakDate = user.lastStreakDate;
-    let newStreak = (user.currentStreak || 0) + 1;
-    let rewardEarned = "1";
-    let isBonusDay = false;
-
-    if (lastStreakDate) {
-      const lastClaim = new Date(lastStreakDate);
-      const minutesSinceLastClaim = (now.getTime() - lastClaim.getTime()) / (1000 * 60);
-      
-      if (minutesSinceLastClaim < 5) {
-        return { newStreak: user.currentStreak || 0, rewardEarned: "0", isBonusDay: false };
-      }
-    }
+    const cooldownStart = new Date(now.getTime() - 5 * 60 * 1000);
+    const rewardEarned = "1";
+    const isBonusDay = false;
 
-    await db
+    // Cooldown check and increment in one UPDATE - two concurrent claims cannot both
+    // pass the 5-minute guard, and the new streak comes back without a second read
+    const [updated] = await db
       .update(users)
       .set({
-        currentStreak: newStreak,
+        currentStreak: sql`COALESCE(${users.currentStreak}, 0) + 1`,
         lastStreakDate: now,
-        updatedAt: new Date(),
+        updatedAt: now,
       })
-      .where(eq(users.id, userId));
+      .where(and(
+        eq(users.id, userId),
+        sql`(${users.lastStreakDate} IS NULL OR ${users.lastStreakDate} <= ${cooldownStart.toISOString()})`
+      ))
+      .returning({ currentStreak: users.currentStreak });
+
+    if (!updated) {
+      // Either the user doesn't exist or the last claim is still inside the cooldown
+      const [user] = await db
+        .select({ currentStreak: users.currentStreak })
+        .from(users)
+        .where(eq(users.id, userId));
+
+      if (!user) {
+        throw new Error("User not found");
+      }
+
+      return { newStreak: user.currentStreak || 0, rewardEarned: "0", isBonusDay: false };
+    }
+
+    invalidateUserCache(userId);
+    const newStreak = updated.currentStreak || 0;
 
     if (parseFloat(rewardEarned) > 0) {
       await this.addEarning({
@@ -631,6 +794,7 @@ export class DatabaseStorage implements IStorage {
       lastExtraAdDate: now,
       updatedAt: now,
     }).where(eq(users.id, userId));
+    invalidateUserCache(userId);
   }
 
   async canWatchExtraAd(userId: string): Promise<boolean> {
@@ -645,6 +809,7 @@ export class DatabaseStorage implements IStorage {
     
     if (!isSameDay) {
       await db.update(users).set({ extraAdsWatchedToday: 0, lastExtraAdDate: now }).where(eq(users.id, userId));
+      invalidateUserCache(userId);
       return true;
     }
 
@@ -665,38 +830,31 @@ export class DatabaseStorage implements IStorage {
     return utcDate;
   }
 
-  async incrementAdsWatched(userId: string): Promise<void> {
-    const [user] = await db.select().from(users).where(eq(users.id, userId));
-    
-    if (!user) return;
-
+  async incrementAdsWatched(userId: string, bugReward: number = 0): Promise<void> {
     const now = new Date();
     const currentResetDate = this.getCurrentResetDate(); // Use new reset method
 
-    // Check if last ad was watched today (same reset period)
-    let adsCount = 1; // Default for first ad of the day
-    
-    if (user.lastAdDate) {
-      const lastAdResetDate = this.getCurrentResetDate(); // Use consistent method
-      const lastAdDateString = user.lastAdDate.toISOString().split('T')[0];
-      
-      // If same reset period, increment current count
-      if (lastAdDateString === currentResetDate) {
-        adsCount = (user.adsWatchedToday || 0) + 1;
-      }
-    }
-
-    console.log(`📊 ADS_COUNT_DEBUG: User ${userId}, Reset Date: ${currentResetDate}, New Count: ${adsCount}, Previous Count: ${user.adsWatchedToday || 0}`);
-
-    await db
+    // Single atomic UPDATE: the daily counter restarts at 1 when the last ad was
+    // watched in an earlier reset period, otherwise it increments in place
+    const [updated] = await db
       .update(users)
       .set({
-        adsWatchedToday: adsCount,
+        adsWatchedToday: sql`CASE WHEN ${users.lastAdDate}::date = ${currentResetDate}::date THEN COALESCE(${users.adsWatchedToday}, 0) + 1 ELSE 1 END`,
         adsWatched: sql`COALESCE(${users.adsWatched}, 0) + 1`, // Increment total ads watched
+        ...(bugReward > 0 ? {
+          bugBalance: sql`COALESCE(${users.bugBalance}, '0')::numeric + ${bugReward}`,
+        } : {}),
         lastAdDate: now,
         updatedAt: now,
       })
-      .where(eq(users.id, userId));
+      .where(eq(users.id, userId))
+      .returning({ adsWatchedToday: users.adsWatchedToday });
+
+    if (!updated) return;
+    invalidateUserCache(userId);
+
+    const adsCount = updated.adsWatchedToday || 0;
+    if (LOG_DEBUG) console.log(`📊 ADS_COUNT_DEBUG: User ${userId}, Reset Date: ${currentResetDate}, New Count: ${adsCount}`);
 
     // NEW: Update task progress for the new task system
     await this.updateTaskProgress(userId, adsCount);
@@ -710,10 +868,11 @@ export class DatabaseStorage implements IStorage {
         updatedAt: new Date(),
       })
       .where(eq(users.id, userId));
+    invalidateUserCache(userId);
   }
 
   async canWatchAd(userId: string): Promise<boolean> {
-    const [user] = await db.select().from(users).where(eq(users.id, userId));
+    const [user] = await getUserByIdStmt.execute({ id: userId });
     if (!user) return false;
     
     const now = new Date();
@@ -745,55 +904,57 @@ export class DatabaseStorage implements IStorage {
       throw new Error('Users cannot refer themselves');
     }
     
-    // Verify both users exist
-    const referrer = await this.getUser(referrerId);
-    const referred = await this.getUser(referredId);
-    
-    if (!referrer) {
-      throw new Error(`Referrer user not found: ${referrerId}`);
-    }
-    
-    if (!referred) {
-      throw new Error(`Referred user not found: ${referredId}`);
-    }
-    
-    // Check if referral already exists
-    const existingReferral = await db
-      .select()
-      .from(referrals)
-      .where(and(
-        eq(referrals.referrerId, referrerId),
-        eq(referrals.refereeId, referredId)
-      ))
-      .limit(1);
+    // Insert the pending referral and stamp the referee's referred_by with the referrer's
+    // referral code in one statement. The INSERT ... SELECT only yields a row when both
+    // users exist and the pair is not already linked.
+    const result = await db.execute(sql`
+      WITH inserted AS (
+        INSERT INTO referrals (referrer_id, referee_id, reward_amount, status)
+        SELECT referrer.id, referee.id, '0.01', 'pending'
+        FROM users referrer, users referee
+        WHERE referrer.id = ${referrerId}
+          AND referee.id = ${referredId}
+          AND NOT EXISTS (
+            SELECT 1 FROM referrals
+            WHERE referrer_id = ${referrerId} AND referee_id = ${referredId}
+          )
+        RETURNING *
+      ), referee_update AS (
+        UPDATE users
+        SET referred_by = (SELECT referral_code FROM users WHERE id = ${referrerId}),
+            updated_at = NOW()
+        WHERE id = ${referredId} AND EXISTS (SELECT 1 FROM inserted)
+        RETURNING referred_by
+      )
+      SELECT inserted.*, referee_update.referred_by
+      FROM inserted LEFT JOIN referee_update ON true
+    `);
+    const row = result.rows[0] as any;
     
-    if (existingReferral.length > 0) {
+    if (!row) {
+      // Nothing inserted - work out why for the caller's logs
+      const [referrer, referred] = await Promise.all([this.getUser(referrerId), this.getUser(referredId)]);
+      if (!referrer) {
+        throw new Error(`Referrer user not found: ${referrerId}`);
+      }
+      if (!referred) {
+        throw new Error(`Referred user not found: ${referredId}`);
+      }
       throw new Error('Referral relationship already exists');
     }
+    invalidateUserCache(referredId);
     
-    // Create the referral relationship (initially pending)
-    const [referral] = await db
-      .insert(referrals)
-      .values({
-        referrerId,
-        refereeId: referredId,
-        rewardAmount: "0.01",
-        status: 'pending', // Pending until friend watches 10 ads
-      })
-      .returning();
-    
-    // CRITICAL: Also update the referred user's referred_by field with the referrer's referral code
-    // This ensures both the referrals table and the user's referred_by field are synchronized
-    await db
-      .update(users)
-      .set({
-        referredBy: referrer.referralCode, // Store the referrer's referral code, not their ID
-        updatedAt: new Date(),
-      })
-      .where(eq(users.id, referredId));
-    
-    console.log(`✅ Referral relationship created (pending): ${referrerId} referred ${referredId}, referred_by updated to: ${referrer.referralCode}`);
-    return referral;
+    console.log(`✅ Referral relationship created (pending): ${referrerId} referred ${referredId}, referred_by updated to: ${row.referred_by}`);
+    return {
+      id: row.id,
+      referrerId: row.referrer_id,
+      refereeId: row.referee_id,
+      rewardAmount: row.reward_amount,
+      usdRewardAmount: row.usd_reward_amount,
+      bugRewardAmount: row.bug_reward_amount,
+      status: row.status,
+      createdAt: row.created_at,
+    };
   }
 
   // Check and activate referral bonus when friend watches required number of ads (PAD + USD rewards)
@@ -828,6 +989,7 @@ export class DatabaseStorage implements IStorage {
           .update(users)
           .set({ firstAdWatched: true })
           .where(eq(users.id, userId));
+        invalidateUserCache(userId);
 
         // Get referral reward settings from admin (no hardcoded values)
         const referralRewardEnabled = await this.getAppSetting('referral_reward_enabled', 'false');
@@ -943,6 +1105,7 @@ export class DatabaseStorage implements IStorage {
           updatedAt: new Date()
         })
         .where(eq(users.id, userId));
+      invalidateUserCache(userId);
       
       console.log(`✅ Cleared orphaned referral for user ${userId}`);
     } catch (error) {
@@ -952,7 +1115,15 @@ export class DatabaseStorage implements IStorage {
   }
 
   async getUserByReferralCode(referralCode: string): Promise<User | null> {
-    const [user] = await db.select().from(users).where(eq(users.referralCode, referralCode)).limit(1);
+    const cachedUserId = userIdByReferralCodeCache.get(referralCode);
+    if (cachedUserId) {
+      const [user] = await getUserByIdStmt.execute({ id: cachedUserId });
+      if (user) return user;
+      userIdByReferralCodeCache.delete(referralCode);
+    }
+
+    const [user] = await getUserByReferralCodeStmt.execute({ referralCode });
+    if (user) userIdByReferralCodeCache.set(referralCode, user.id);
     return user || null;
   }
 
@@ -991,61 +1162,29 @@ export class DatabaseStorage implements IStorage {
     try {
       console.log('🔄 Starting referral data synchronization...');
       
-      // Find all users who have referred_by but no entry in referrals table
-      const usersWithReferredBy = await db
-        .select({
-          userId: users.id,
-          referredBy: users.referredBy,
-          referralCode: users.referralCode
-        })
-        .from(users)
-        .where(and(
-          sql`${users.referredBy} IS NOT NULL`,
-          sql`${users.referredBy} != ''`
-        ));
+      // Create every missing referrer -> referee pair in one INSERT ... SELECT instead of
+      // a lookup + existence check + insert round trip per user
+      const created = await db.execute(sql`
+        INSERT INTO referrals (referrer_id, referee_id, reward_amount, status)
+        SELECT referrer.id, u.id, '0.01', 'pending'
+        FROM users u
+        JOIN users referrer ON referrer.referral_code = u.referred_by
+        WHERE u.referred_by IS NOT NULL AND u.referred_by != ''
+          AND referrer.id <> u.id
+        ON CONFLICT (referrer_id, referee_id) DO NOTHING
+        RETURNING referrer_id, referee_id
+      `);
 
-      console.log(`Found ${usersWithReferredBy.length} users with referred_by field set`);
+      console.log(`Created ${created.rows.length} missing referral relationships`);
 
-      for (const user of usersWithReferredBy) {
+      for (const row of created.rows as { referrer_id: string; referee_id: string }[]) {
         try {
-          // Skip if referredBy is null or empty
-          if (!user.referredBy) continue;
+          console.log(`✅ Created missing referral: ${row.referrer_id} -> ${row.referee_id}`);
           
-          // Find the referrer by their referral code
-          const referrer = await this.getUserByReferralCode(user.referredBy);
-          
-          if (referrer) {
-            // Check if referral relationship already exists
-            const existingReferral = await db
-              .select()
-              .from(referrals)
-              .where(and(
-                eq(referrals.referrerId, referrer.id),
-                eq(referrals.refereeId, user.userId)
-              ))
-              .limit(1);
-
-            if (existingReferral.length === 0) {
-              // Create the missing referral relationship
-              await db
-                .insert(referrals)
-                .values({
-                  referrerId: referrer.id,
-                  refereeId: user.userId,
-                  rewardAmount: "0.01",
-                  status: 'pending', // Will be updated by checkAndActivateReferralBonus if user has 10+ ads
-                });
-              
-              console.log(`✅ Created missing referral: ${referrer.id} -> ${user.userId}`);
-              
-              // Check if this user should have activated referral bonus
-              await this.checkAndActivateReferralBonus(user.userId);
-            }
-          } else {
-            console.log(`⚠️  Referrer not found for referral code: ${user.referredBy}`);
-          }
+          // Check if this user should have activated referral bonus
+          await this.checkAndActivateReferralBonus(row.referee_id);
         } catch (error) {
-          console.error(`❌ Error processing user ${user.userId}:`, error);
+          console.error(`❌ Error processing user ${row.referee_id}:`, error);
         }
       }
       
@@ -1056,25 +1195,42 @@ export class DatabaseStorage implements IStorage {
   }
 
   async generateReferralCode(userId: string): Promise<string> {
-    // First check if user already has a referral code
-    const [user] = await db.select().from(users).where(eq(users.id, userId));
-    
-    if (user && user.referralCode) {
-      return user.referralCode;
+    // Only fill an empty code, so a concurrent caller can never overwrite one already handed out
+    for (let attempt = 1; attempt <= REFERRAL_CODE_ATTEMPTS; attempt++) {
+      // Generate a secure random referral code using crypto
+      const code = crypto.randomBytes(6).toString('hex'); // 12-character hex code
+      
+      try {
+        const [updated] = await db
+          .update(users)
+          .set({
+            referralCode: code,
+            updatedAt: new Date(),
+          })
+          .where(and(
+            eq(users.id, userId),
+            sql`(${users.referralCode} IS NULL OR ${users.referralCode} = '')`
+          ))
+          .returning({ referralCode: users.referralCode });
+        
+        if (!updated) break;
+        
+        invalidateUserCache(userId);
+        return code;
+      } catch (error: any) {
+        // Collision with another user's code - draw a new one
+        if (error?.code !== '23505' || attempt === REFERRAL_CODE_ATTEMPTS) {
+          throw error;
+        }
+      }
     }
     
-    // Generate a secure random referral code using crypto
-    const code = crypto.randomBytes(6).toString('hex'); // 12-character hex code
-    
-    await db
-      .update(users)
-      .set({
-        referralCode: code,
-        updatedAt: new Date(),
-      })
+    // User already has a code (or does not exist)
+    const [user] = await db
+      .select({ referralCode: users.referralCode })
+      .from(users)
       .where(eq(users.id, userId));
-    
-    return code;
+    return user?.referralCode || '';
   }
 
   // Admin operations
@@ -1093,6 +1249,7 @@ export class DatabaseStorage implements IStorage {
         updatedAt: new Date(),
       })
       .where(eq(users.id, userId));
+    invalidateUserCache(userId);
   }
 
   // Promo code operations
@@ -1291,7 +1448,7 @@ export class DatabaseStorage implements IStorage {
       }
 
       // Find payment system and calculate fee
-      const paymentSystem = PAYMENT_SYSTEMS.find(p => p.id === paymentSystemId);
+      const paymentSystem = PAYMENT_SYSTEMS_BY_ID.get(paymentSystemId);
       if (!paymentSystem) {
         return { success: false, message: 'Invalid payment system' };
       }
@@ -1299,14 +1456,15 @@ export class DatabaseStorage implements IStorage {
       const requestedAmount = parseFloat(amount);
       const fee = paymentSystem.fee;
       const netAmount = requestedAmount - fee;
+      const messages = PAYMENT_SYSTEM_MESSAGES.get(paymentSystem.id)!;
       
       // Validate minimum withdrawal amount and ensure net amount is positive
       if (requestedAmount < paymentSystem.minWithdrawal) {
-        return { success: false, message: `Minimum withdrawal is ${paymentSystem.minWithdrawal} ${paymentSystem.name}` };
+        return { success: false, message: messages.belowMinimum };
       }
       
       if (netAmount <= 0) {
-        return { success: false, message: `Withdrawal amount must be greater than the fee of ${fee} ${paymentSystem.name}` };
+        return { success: false, message: messages.belowFee };
       }
 
       // Check balance (but don't deduct yet - wait for admin approval)
@@ -1360,45 +1518,56 @@ export class DatabaseStorage implements IStorage {
     const today = new Date(now.getFullYear(), now.getMonth(), now.getDate());
     const yesterday = new Date(today.getTime() - 24 * 60 * 60 * 1000);
 
-    // Total users
-    const [totalUsersResult] = await db
-      .select({ count: sql<number>`count(*)` })
-      .from(users);
+    // Independent aggregates - run them concurrently instead of one after another
+    const [
+      [totalUsersResult],
+      [activeUsersResult],
+      [totalInvitesResult],
+      [totalEarningsResult],
+      [totalReferralEarningsResult],
+      [totalPayoutsResult],
+      [newUsersResult],
+    ] = await Promise.all([
+      // Total users
+      db
+        .select({ count: sql<number>`count(*)` })
+        .from(users),
 
-    // Active users today (users who earned something today)
-    const [activeUsersResult] = await db
-      .select({ count: sql<number>`count(DISTINCT ${earnings.userId})` })
-      .from(earnings)
-      .where(gte(earnings.createdAt, today));
+      // Active users today (users who earned something today)
+      db
+        .select({ count: sql<number>`count(DISTINCT ${earnings.userId})` })
+        .from(earnings)
+        .where(gte(earnings.createdAt, today)),
 
-    // Total invites
-    const [totalInvitesResult] = await db
-      .select({ count: sql<number>`count(*)` })
-      .from(referrals);
+      // Total invites
+      db
+        .select({ count: sql<number>`count(*)` })
+        .from(referrals),
 
-    // Total earnings (positive amounts only)
-    const [totalEarningsResult] = await db
-      .select({ total: sql<string>`COALESCE(SUM(${earnings.amount}), '0')` })
-      .from(earnings)
-      .where(sql`${earnings.amount} > 0`);
+      // Total earnings (positive amounts only)
+      db
+        .select({ total: sql<string>`COALESCE(SUM(${earnings.amount}), '0')` })
+        .from(earnings)
+        .where(sql`${earnings.amount} > 0`),
 
-    // Total referral earnings
-    const [totalReferralEarningsResult] = await db
-      .select({ total: sql<string>`COALESCE(SUM(${earnings.amount}), '0')` })
-      .from(earnings)
-      .where(sql`${earnings.source} IN ('referral_commission', 'referral')`);
+      // Total referral earnings
+      db
+        .select({ total: sql<string>`COALESCE(SUM(${earnings.amount}), '0')` })
+        .from(earnings)
+        .where(sql`${earnings.source} IN ('referral_commission', 'referral')`),
 
-    // Total payouts (negative amounts)
-    const [totalPayoutsResult] = await db
-      .select({ total: sql<string>`COALESCE(ABS(SUM(${earnings.amount})), '0')` })
-      .from(earnings)
-      .where(eq(earnings.source, 'payout'));
+      // Total payouts (negative amounts)
+      db
+        .select({ total: sql<string>`COALESCE(ABS(SUM(${earnings.amount})), '0')` })
+        .from(earnings)
+        .where(eq(earnings.source, 'payout')),
 
-    // New users in last 24h
-    const [newUsersResult] = await db
-      .select({ count: sql<number>`count(*)` })
-      .from(users)
-      .where(gte(users.createdAt, yesterday));
+      // New users in last 24h
+      db
+        .select({ count: sql<number>`count(*)` })
+        .from(users)
+        .where(gte(users.createdAt, yesterday)),
+    ]);
 
     return {
       totalUsers: totalUsersResult.count || 0,
@@ -1440,115 +1609,125 @@ export class DatabaseStorage implements IStorage {
 
   async approveWithdrawal(withdrawalId: string, adminNotes?: string, transactionHash?: string): Promise<{ success: boolean; message: string; withdrawal?: Withdrawal }> {
     try {
-      // Get withdrawal details
-      const [withdrawal] = await db.select().from(withdrawals).where(eq(withdrawals.id, withdrawalId));
-      if (!withdrawal) {
-        return { success: false, message: 'Withdrawal not found' };
-      }
-      
-      if (withdrawal.status !== 'pending') {
-        return { success: false, message: 'Withdrawal is not pending' };
-      }
+      // Lock the withdrawal and user rows until the approval commits, so a repeated
+      // Approve click waits and then sees the withdrawal is no longer pending
+      const result = await db.transaction(async (tx): Promise<{ success: boolean; message: string; withdrawal?: Withdrawal }> => {
+        // Get withdrawal details
+        const [withdrawal] = await tx.select().from(withdrawals).where(eq(withdrawals.id, withdrawalId)).for('update');
+        if (!withdrawal) {
+          return { success: false, message: 'Withdrawal not found' };
+        }
+        
+        if (withdrawal.status !== 'pending') {
+          return { success: false, message: 'Withdrawal is not pending' };
+        }
 
-      // Get user for logging and balance management
-      const user = await this.getUser(withdrawal.userId);
-      if (!user) {
-        return { success: false, message: 'User not found' };
-      }
+        // Get user for logging and balance management
+        const [user] = await tx.select().from(users).where(eq(users.id, withdrawal.userId)).for('update');
+        if (!user) {
+          return { success: false, message: 'User not found' };
+        }
 
-      const withdrawalAmount = parseFloat(withdrawal.amount);
-      
-      // Get the total amount that should be deducted (includes fee) from withdrawal details
-      // The withdrawal.amount is the NET amount after fee, but we need to deduct the TOTAL (with fee)
-      const withdrawalDetails = withdrawal.details as any;
-      const totalToDeduct = withdrawalDetails?.totalDeducted 
-        ? parseFloat(withdrawalDetails.totalDeducted) 
-        : withdrawalAmount;
-      
-      // ALL withdrawals use USD balance (the method just indicates payment preference: TON, USD, STARS, etc.)
-      // This matches the withdrawal creation flow where all amounts are in USD
-      const currency = 'USD';
-      const userBalance = parseFloat(user.usdBalance || '0');
-
-      // Handle balance deduction with support for legacy withdrawals
-      // Legacy withdrawals (created before the fix) already had balance deducted at request time
-      // New withdrawals have balance deducted only on approval
-      const bugDeducted = withdrawalDetails?.bugDeducted ? parseFloat(withdrawalDetails.bugDeducted) : 0;
-      const currentBugBalance = parseFloat(user.bugBalance || '0');
-      
-      if (userBalance >= totalToDeduct) {
-        // User has sufficient balance - this is a NEW withdrawal (or user earned more since request)
-        // Deduct balance now on approval
-        console.log(`💰 Deducting USD balance now for approved withdrawal`);
-        console.log(`💰 Net amount: $${withdrawalAmount}, Total to deduct (with fee): $${totalToDeduct}`);
-        console.log(`💰 Previous USD balance: ${userBalance}, New balance: ${(userBalance - totalToDeduct).toFixed(10)}`);
-
-        const newUsdBalance = (userBalance - totalToDeduct).toFixed(10);
-        const newBugBalance = Math.max(0, currentBugBalance - bugDeducted).toFixed(10);
+        const withdrawalAmount = parseFloat(withdrawal.amount);
         
-        await db
+        // Get the total amount that should be deducted (includes fee) from withdrawal details
+        // The withdrawal.amount is the NET amount after fee, but we need to deduct the TOTAL (with fee)
+        const withdrawalDetails = withdrawal.details as any;
+        const totalToDeduct = withdrawalDetails?.totalDeducted 
+          ? parseFloat(withdrawalDetails.totalDeducted) 
+          : withdrawalAmount;
+        
+        // ALL withdrawals use USD balance (the method just indicates payment preference: TON, USD, STARS, etc.)
+        // This matches the withdrawal creation flow where all amounts are in USD
+        const currency = 'USD';
+        const userBalance = parseFloat(user.usdBalance || '0');
+
+        // Handle balance deduction with support for legacy withdrawals
+        // Legacy withdrawals (created before the fix) already had balance deducted at request time
+        // New withdrawals have balance deducted only on approval
+        const bugDeducted = withdrawalDetails?.bugDeducted ? parseFloat(withdrawalDetails.bugDeducted) : 0;
+
+        // Deduct only if the balance still covers the withdrawal - the check and the
+        // subtraction happen in one statement, so a concurrent debit cannot overdraw
+        const [deducted] = await tx
           .update(users)
           .set({
-            usdBalance: newUsdBalance,
-            bugBalance: newBugBalance,
+            usdBalance: sql`COALESCE(${users.usdBalance}, 0) - ${totalToDeduct}`,
+            bugBalance: sql`GREATEST(0, COALESCE(${users.bugBalance}, 0) - ${bugDeducted})`,
             updatedAt: new Date()
           })
-          .where(eq(users.id, withdrawal.userId));
-        console.log(`✅ USD balance deducted: ${userBalance} → ${newUsdBalance}`);
-        if (bugDeducted > 0) {
-          console.log(`✅ BUG balance deducted: ${currentBugBalance} → ${newBugBalance}`);
+          .where(and(
+            eq(users.id, withdrawal.userId),
+            sql`COALESCE(${users.usdBalance}, 0) >= ${totalToDeduct}`
+          ))
+          .returning({ usdBalance: users.usdBalance, bugBalance: users.bugBalance });
+        
+        if (deducted) {
+          // User had sufficient balance - this is a NEW withdrawal (or user earned more since request)
+          console.log(`💰 Net amount: $${withdrawalAmount}, Total deducted (with fee): $${totalToDeduct}`);
+          console.log(`✅ USD balance deducted: ${userBalance} → ${deducted.usdBalance}`);
+          if (bugDeducted > 0) {
+            console.log(`✅ BUG balance deducted: ${user.bugBalance || '0'} → ${deducted.bugBalance}`);
+          }
+        } else {
+          // User doesn't have sufficient balance - this is a LEGACY withdrawal
+          // Balance was already deducted at request time (old flow), so just approve without deducting again
+          console.log(`⚠️ Legacy withdrawal detected - balance was already deducted at request time`);
+          console.log(`💰 Current USD balance: ${userBalance}, Required: ${totalToDeduct}`);
+          console.log(`✅ Approving without additional balance deduction (legacy flow)`);
         }
-      } else {
-        // User doesn't have sufficient balance - this is a LEGACY withdrawal
-        // Balance was already deducted at request time (old flow), so just approve without deducting again
-        console.log(`⚠️ Legacy withdrawal detected - balance was already deducted at request time`);
-        console.log(`💰 Current USD balance: ${userBalance}, Required: ${totalToDeduct}`);
-        console.log(`✅ Approving without additional balance deduction (legacy flow)`);
-      }
 
-      // Record withdrawal in earnings history for proper stats tracking
-      const paymentSystemName = withdrawal.method;
-      const description = `Withdrawal approved: ${withdrawal.amount} ${currency} via ${paymentSystemName}`;
-      
-      await db.insert(earnings).values({
-        userId: withdrawal.userId,
-        amount: `-${withdrawalAmount.toString()}`,
-        source: 'withdrawal',
-        description: description,
-      });
+        // Record withdrawal in earnings history for proper stats tracking
+        const paymentSystemName = withdrawal.method;
+        const description = `Withdrawal approved: ${withdrawal.amount} ${currency} via ${paymentSystemName}`;
+        
+        await tx.insert(earnings).values({
+          userId: withdrawal.userId,
+          amount: `-${withdrawalAmount.toString()}`,
+          source: 'withdrawal',
+          description: description,
+        });
 
-      // Also log the transaction for audit trail
-      await this.logTransaction({
-        userId: withdrawal.userId,
-        amount: `-${withdrawalAmount.toString()}`,
-        type: 'debit',
-        source: 'withdrawal',
-        description: description,
-        metadata: { withdrawalId, currency, method: paymentSystemName }
+        // Also log the transaction for audit trail
+        await tx.insert(transactions).values({
+          userId: withdrawal.userId,
+          amount: `-${withdrawalAmount.toString()}`,
+          type: 'debit',
+          source: 'withdrawal',
+          description: description,
+          metadata: { withdrawalId, currency, method: paymentSystemName }
+        });
+
+        // Update withdrawal status to Approved and mark as deducted
+        const updateData: any = { 
+          status: 'Approved', 
+          deducted: true,
+          updatedAt: new Date() 
+        };
+        if (transactionHash) updateData.transactionHash = transactionHash;
+        if (adminNotes) updateData.adminNotes = adminNotes;
+        
+        const [updatedWithdrawal] = await tx.update(withdrawals).set(updateData).where(eq(withdrawals.id, withdrawalId)).returning();
+
+        return { success: true, message: 'Withdrawal approved and processed', withdrawal: updatedWithdrawal };
       });
 
-      // Update withdrawal status to Approved and mark as deducted
-      const updateData: any = { 
-        status: 'Approved', 
-        deducted: true,
-        updatedAt: new Date() 
-      };
-      if (transactionHash) updateData.transactionHash = transactionHash;
-      if (adminNotes) updateData.adminNotes = adminNotes;
-      
-      const [updatedWithdrawal] = await db.update(withdrawals).set(updateData).where(eq(withdrawals.id, withdrawalId)).returning();
+      if (!result.success || !result.withdrawal) {
+        return result;
+      }
+      invalidateUserCache(result.withdrawal.userId);
       
-      console.log(`✅ Withdrawal #${withdrawalId} approved with balance deduction — ${currency} balance updated ✅`);
+      console.log(`✅ Withdrawal #${withdrawalId} approved with balance deduction — USD balance updated ✅`);
       
       // Send group notification for approval
       try {
         const { sendWithdrawalApprovedNotification } = require('./telegram');
-        await sendWithdrawalApprovedNotification(updatedWithdrawal);
+        await sendWithdrawalApprovedNotification(result.withdrawal);
       } catch (notifyError) {
         console.error('⚠️ Failed to send withdrawal approval notification:', notifyError);
       }
       
-      return { success: true, message: 'Withdrawal approved and processed', withdrawal: updatedWithdrawal };
+      return result;
     } catch (error) {
       console.error('Error approving withdrawal:', error);
       return { success: false, message: 'Error processing withdrawal approval' };
@@ -1557,73 +1736,81 @@ export class DatabaseStorage implements IStorage {
 
   async rejectWithdrawal(withdrawalId: string, adminNotes?: string): Promise<{ success: boolean; message: string; withdrawal?: Withdrawal }> {
     try {
-      // Get withdrawal details
-      const [withdrawal] = await db.select().from(withdrawals).where(eq(withdrawals.id, withdrawalId));
-      if (!withdrawal) {
-        return { success: false, message: 'Withdrawal not found' };
-      }
-      
-      if (withdrawal.status !== 'pending') {
-        return { success: false, message: 'Withdrawal is not pending' };
-      }
+      // Same row locks as approveWithdrawal - approve and reject cannot interleave
+      const result = await db.transaction(async (tx): Promise<{ success: boolean; message: string; withdrawal?: Withdrawal }> => {
+        // Get withdrawal details
+        const [withdrawal] = await tx.select().from(withdrawals).where(eq(withdrawals.id, withdrawalId)).for('update');
+        if (!withdrawal) {
+          return { success: false, message: 'Withdrawal not found' };
+        }
+        
+        if (withdrawal.status !== 'pending') {
+          return { success: false, message: 'Withdrawal is not pending' };
+        }
 
-      // Get user and withdrawal details for potential refund
-      const user = await this.getUser(withdrawal.userId);
-      if (!user) {
-        return { success: false, message: 'User not found' };
-      }
-      
-      const withdrawalAmount = parseFloat(withdrawal.amount);
-      const withdrawalDetails = withdrawal.details as any;
-      const totalToRefund = withdrawalDetails?.totalDeducted 
-        ? parseFloat(withdrawalDetails.totalDeducted) 
-        : withdrawalAmount;
-      const bugToRefund = withdrawalDetails?.bugDeducted ? parseFloat(withdrawalDetails.bugDeducted) : 0;
-      const currentUsdBalance = parseFloat(user.usdBalance || '0');
-      const currentBugBalance = parseFloat(user.bugBalance || '0');
-      
-      // Check if this is a LEGACY withdrawal (balance was already deducted at request time)
-      // Legacy withdrawals have insufficient balance because it was already taken
-      // We detect this by checking if the user's balance is lower than expected
-      // For legacy withdrawals, we need to REFUND the balance
-      if (currentUsdBalance < totalToRefund) {
-        // LEGACY withdrawal - refund the balance that was already deducted
-        console.log(`⚠️ Legacy withdrawal detected - refunding balance that was deducted at request time`);
-        const newUsdBalance = (currentUsdBalance + totalToRefund).toFixed(10);
-        const newBugBalance = (currentBugBalance + bugToRefund).toFixed(10);
+        // Get user and withdrawal details for potential refund
+        const [user] = await tx.select().from(users).where(eq(users.id, withdrawal.userId)).for('update');
+        if (!user) {
+          return { success: false, message: 'User not found' };
+        }
         
-        await db
-          .update(users)
-          .set({
-            usdBalance: newUsdBalance,
-            bugBalance: newBugBalance,
-            updatedAt: new Date()
-          })
-          .where(eq(users.id, withdrawal.userId));
-        console.log(`💰 USD balance refunded: ${currentUsdBalance} → ${newUsdBalance}`);
-        if (bugToRefund > 0) {
-          console.log(`💰 BUG balance refunded: ${currentBugBalance} → ${newBugBalance}`);
+        const withdrawalAmount = parseFloat(withdrawal.amount);
+        const withdrawalDetails = withdrawal.details as any;
+        const totalToRefund = withdrawalDetails?.totalDeducted 
+          ? parseFloat(withdrawalDetails.totalDeducted) 
+          : withdrawalAmount;
+        const bugToRefund = withdrawalDetails?.bugDeducted ? parseFloat(withdrawalDetails.bugDeducted) : 0;
+        const currentUsdBalance = parseFloat(user.usdBalance || '0');
+        const currentBugBalance = parseFloat(user.bugBalance || '0');
+        
+        // Check if this is a LEGACY withdrawal (balance was already deducted at request time)
+        // Legacy withdrawals have insufficient balance because it was already taken
+        // We detect this by checking if the user's balance is lower than expected
+        // For legacy withdrawals, we need to REFUND the balance
+        if (currentUsdBalance < totalToRefund) {
+          // LEGACY withdrawal - refund the balance that was already deducted
+          console.log(`⚠️ Legacy withdrawal detected - refunding balance that was deducted at request time`);
+          const newUsdBalance = (currentUsdBalance + totalToRefund).toFixed(10);
+          const newBugBalance = (currentBugBalance + bugToRefund).toFixed(10);
+          
+          await tx
+            .update(users)
+            .set({
+              usdBalance: newUsdBalance,
+              bugBalance: newBugBalance,
+              updatedAt: new Date()
+            })
+            .where(eq(users.id, withdrawal.userId));
+          console.log(`💰 USD balance refunded: ${currentUsdBalance} → ${newUsdBalance}`);
+          if (bugToRefund > 0) {
+            console.log(`💰 BUG balance refunded: ${currentBugBalance} → ${newBugBalance}`);
+          }
+        } else {
+          // NEW withdrawal - balance was never deducted, nothing to refund
+          console.log(`❌ Withdrawal #${withdrawalId} rejected - no refund needed (balance was never deducted)`);
+          console.log(`💡 User balance remains unchanged`);
         }
-      } else {
-        // NEW withdrawal - balance was never deducted, nothing to refund
-        console.log(`❌ Withdrawal #${withdrawalId} rejected - no refund needed (balance was never deducted)`);
-        console.log(`💡 User balance remains unchanged`);
-      }
 
-      // Update withdrawal status to rejected
-      const updateData: any = { 
-        status: 'rejected', 
-        refunded: false,
-        deducted: false,
-        updatedAt: new Date() 
-      };
-      if (adminNotes) updateData.adminNotes = adminNotes;
-      
-      const [updatedWithdrawal] = await db.update(withdrawals).set(updateData).where(eq(withdrawals.id, withdrawalId)).returning();
-      
-      console.log(`✅ Withdrawal #${withdrawalId} rejected - balance remains untouched`);
+        // Update withdrawal status to rejected
+        const updateData: any = { 
+          status: 'rejected', 
+          refunded: false,
+          deducted: false,
+          updatedAt: new Date() 
+        };
+        if (adminNotes) updateData.adminNotes = adminNotes;
+        
+        const [updatedWithdrawal] = await tx.update(withdrawals).set(updateData).where(eq(withdrawals.id, withdrawalId)).returning();
+
+        return { success: true, message: 'Withdrawal rejected', withdrawal: updatedWithdrawal };
+      });
+
+      if (result.success && result.withdrawal) {
+        invalidateUserCache(result.withdrawal.userId);
+        console.log(`✅ Withdrawal #${withdrawalId} rejected - balance remains untouched`);
+      }
       
-      return { success: true, message: 'Withdrawal rejected', withdrawal: updatedWithdrawal };
+      return result;
     } catch (error) {
       console.error('Error rejecting withdrawal:', error);
       return { success: false, message: 'Error processing withdrawal rejection' };
@@ -1848,10 +2035,7 @@ export class DatabaseStorage implements IStorage {
 
     for (const promotion of allPromotions) {
       // Check if this is a daily task type
-      const isDailyTask = [
-        'channel_visit', 'share_link', 'invite_friend',
-        'ads_goal_mini', 'ads_goal_light', 'ads_goal_medium', 'ads_goal_hard'
-      ].includes(promotion.type);
+      const isDailyTask = DAILY_TASK_TYPES.has(promotion.type);
 
       const periodDate = isDailyTask ? currentDate : undefined;
       
@@ -2097,7 +2281,7 @@ export class DatabaseStorage implements IStorage {
         );
 
       const count = Number(todayReferrals[0]?.count || 0);
-      console.log(`🔍 Referral validation for user ${userId}: ${count} new referrals today`);
+      if (LOG_DEBUG) console.log(`🔍 Referral validation for user ${userId}: ${count} new referrals today`);
       
       return count >= 1;
     } catch (error) {
@@ -2147,6 +2331,7 @@ export class DatabaseStorage implements IStorage {
       await db.update(users)
         .set({ appShared: true })
         .where(eq(users.id, userId));
+      invalidateUserCache(userId);
 
       return { success: true, message: 'Link share recorded successfully' };
     } catch (error) {
@@ -2225,7 +2410,7 @@ export class DatabaseStorage implements IStorage {
         return { success: false, message: 'Task not found' };
       }
 
-      const isDailyTask = ['channel_visit', 'share_link', 'invite_friend', 'ads_goal_mini', 'ads_goal_light', 'ads_goal_medium', 'ads_goal_hard'].includes(taskType);
+      const isDailyTask = DAILY_TASK_TYPES.has(taskType);
       const periodDate = isDailyTask ? this.getCurrentTaskDate() : undefined;
 
       // Check current status
@@ -2301,7 +2486,7 @@ export class DatabaseStorage implements IStorage {
         return { success: false, message: 'Task not found' };
       }
 
-      const isDailyTask = ['channel_visit', 'share_link', 'invite_friend', 'ads_goal_mini', 'ads_goal_light', 'ads_goal_medium', 'ads_goal_hard'].includes(promotion.type);
+      const isDailyTask = DAILY_TASK_TYPES.has(promotion.type);
       const periodDate = isDailyTask ? this.getCurrentTaskDate() : undefined;
 
       // Check current status
@@ -2401,6 +2586,7 @@ export class DatabaseStorage implements IStorage {
       await db.update(users)
         .set({ channelVisited: true })
         .where(eq(users.id, userId));
+      invalidateUserCache(userId);
 
       return { success: true, message: 'Channel visit recorded successfully' };
     } catch (error) {
@@ -2423,6 +2609,7 @@ export class DatabaseStorage implements IStorage {
       await db.update(users)
         .set({ friendsInvited: newCount })
         .where(eq(users.id, userId));
+      invalidateUserCache(userId);
 
       return { success: true, message: `Referrals today count updated to ${newCount}` };
     } catch (error) {
@@ -2468,6 +2655,7 @@ export class DatabaseStorage implements IStorage {
           lastAdDate: currentDate 
         })
         .where(sql`${users.lastResetAt} < ${periodStart.toISOString()} OR ${users.lastResetAt} IS NULL`);
+      clearUserCache();
       
       // 3. Create daily task completion records for all task types for this period
       const taskTypes = ['channel_visit', 'share_link', 'invite_friend', 'ads_mini', 'ads_light', 'ads_medium', 'ads_hard'];
@@ -2942,28 +3130,22 @@ export class DatabaseStorage implements IStorage {
       const resetTime = new Date(currentDate);
       resetTime.setUTCHours(0, 0, 0, 0); // 00:00 UTC reset
       
-      // Check if today's reset has already been performed
-      const usersNeedingReset = await db.select({ id: users.id })
-        .from(users)
-        .where(sql`${users.lastResetDate} != ${currentDateString} OR ${users.lastResetDate} IS NULL`)
-        .limit(1000);
-      
-      if (usersNeedingReset.length === 0) {
-        console.log('🔄 Daily reset already completed for today');
-        return;
-      }
-      
-      console.log(`🔄 Resetting ${usersNeedingReset.length} users for ${currentDateString}`);
-      
-      // Reset all users' daily counters
-      await db.update(users)
+      // Only rows still carrying a counter from before today's reset need rewriting.
+      // Users who already watched an ad today were restarted at 1 by incrementAdsWatched,
+      // so the last_ad_date guard keeps this idempotent across the 5-minute window.
+      const result = await db.update(users)
         .set({ 
           adsWatchedToday: 0,
           lastResetDate: currentDate,
           updatedAt: new Date(),
         })
-        .where(sql`${users.lastResetDate} != ${currentDateString} OR ${users.lastResetDate} IS NULL`);
+        .where(and(
+          sql`${users.adsWatchedToday} <> 0`,
+          sql`(${users.lastAdDate} IS NULL OR ${users.lastAdDate} < ${resetTime.toISOString()})`
+        ));
       
+      clearUserCache();
+      console.log(`🔄 Reset ${result.rowCount ?? 0} users for ${currentDateString}`);
       console.log('✅ Daily reset completed successfully (new task system)');
       
     } catch (error) {
@@ -3094,6 +3276,46 @@ export class DatabaseStorage implements IStorage {
     return result[0]?.count || 0;
   }
 
+  // All referral counters and reward totals for the affiliates page in one round trip.
+  // Successful invites match getValidReferralCount (completed and referee not banned);
+  // reward totals are the historical amounts stored on completed referrals.
+  async getReferralStats(userId: string): Promise<{
+    totalInvites: number;
+    successfulInvites: number;
+    completedReferrals: number;
+    totalUsdEarned: number;
+    totalBugEarned: number;
+    totalClaimedReferralBonus: string;
+    pendingReferralBonus: string;
+  }> {
+    const result = await db.execute(sql`
+      SELECT
+        u.total_claimed_referral_bonus,
+        u.pending_referral_bonus,
+        COUNT(r.id)::int AS total_invites,
+        COUNT(r.id) FILTER (WHERE r.status = 'completed' AND referee.banned = false)::int AS successful_invites,
+        COUNT(r.id) FILTER (WHERE r.status = 'completed')::int AS completed_referrals,
+        COALESCE(SUM(r.usd_reward_amount) FILTER (WHERE r.status = 'completed'), 0) AS total_usd_earned,
+        COALESCE(SUM(r.bug_reward_amount) FILTER (WHERE r.status = 'completed'), 0) AS total_bug_earned
+      FROM users u
+      LEFT JOIN referrals r ON r.referrer_id = u.id
+      LEFT JOIN users referee ON referee.id = r.referee_id
+      WHERE u.id = ${userId}
+      GROUP BY u.id
+    `);
+    const row = result.rows[0] as any;
+
+    return {
+      totalInvites: row?.total_invites || 0,
+      successfulInvites: row?.successful_invites || 0,
+      completedReferrals: row?.completed_referrals || 0,
+      totalUsdEarned: parseFloat(row?.total_usd_earned || '0'),
+      totalBugEarned: parseFloat(row?.total_bug_earned || '0'),
+      totalClaimedReferralBonus: row?.total_claimed_referral_bonus || '0',
+      pendingReferralBonus: row?.pending_referral_bonus || '0',
+    };
+  }
+
   // Get tasks created by a specific user (my tasks)
   async getMyTasks(userId: string): Promise<any[]> {
     const result = await db
@@ -3315,6 +3537,7 @@ export class DatabaseStorage implements IStorage {
           updatedAt: new Date()
         })
         .where(eq(users.id, publisherId));
+      invalidateUserCache(publisherId);
 
       // Record the earning
       await db.insert(earnings).values({
@@ -3323,6 +3546,7 @@ export class DatabaseStorage implements IStorage {
         source: 'task_completion',
         description: `Completed ${task.taskType} task: ${task.title}`,
       });
+      invalidateUserStatsCache(publisherId);
 
       console.log(`✅ Task click recorded: ${taskId} by ${publisherId} - Reward: ${rewardPAD} PAD`);
 
@@ -3349,14 +3573,15 @@ export class DatabaseStorage implements IStorage {
   // Get app setting from admin_settings table
   async getAppSetting(key: string, defaultValue: string | number): Promise<string> {
     try {
-      const [setting] = await db
-        .select({ settingValue: adminSettings.settingValue })
-        .from(adminSettings)
-        .where(eq(adminSettings.settingKey, key))
-        .limit(1);
+      let value = appSettingCache.get(key);
+      if (value === undefined) {
+        const [setting] = await getAppSettingStmt.execute({ key });
+        value = setting?.settingValue || null;
+        appSettingCache.set(key, value);
+      }
       
-      if (setting && setting.settingValue) {
-        return setting.settingValue;
+      if (value) {
+        return value;
       }
       return String(defaultValue);
     } catch (error) {
@@ -3373,37 +3598,35 @@ export class DatabaseStorage implements IStorage {
         throw new Error('Invalid USD amount');
       }
 
-      // Get current USD balance
-      const [user] = await db
-        .select({ usdBalance: users.usdBalance })
-        .from(users)
-        .where(eq(users.id, userId));
-
-      if (!user) {
-        throw new Error('User not found');
-      }
+      // Add in SQL so concurrent credits to the same user stack instead of conflicting,
+      // and write the ledger entry in the same transaction
+      const newUsdBalance = await db.transaction(async (tx) => {
+        const [updated] = await tx
+          .update(users)
+          .set({
+            usdBalance: sql`COALESCE(${users.usdBalance}, 0) + ${amountNum.toFixed(10)}`,
+            updatedAt: new Date()
+          })
+          .where(eq(users.id, userId))
+          .returning({ usdBalance: users.usdBalance });
 
-      const currentUsdBalance = parseFloat(user.usdBalance || '0');
-      const newUsdBalance = (currentUsdBalance + amountNum).toFixed(10);
+        if (!updated) {
+          throw new Error('User not found');
+        }
 
-      // Update user's USD balance
-      await db
-        .update(users)
-        .set({
-          usdBalance: newUsdBalance,
-          updatedAt: new Date()
-        })
-        .where(eq(users.id, userId));
+        // Log the transaction
+        await tx.insert(transactions).values({
+          userId,
+          amount: amount,
+          type: 'credit',
+          source: source,
+          description: description,
+          metadata: { rewardType: 'USD' }
+        });
 
-      // Log the transaction
-      await this.logTransaction({
-        userId,
-        amount: amount,
-        type: 'credit',
-        source: source,
-        description: description,
-        metadata: { rewardType: 'USD' }
+        return updated.usdBalance;
       });
+      invalidateUserCache(userId);
 
       console.log(`✅ Added $${amountNum} USD to user ${userId}. New balance: $${newUsdBalance}`);
     } catch (error) {
@@ -3420,37 +3643,35 @@ export class DatabaseStorage implements IStorage {
         throw new Error('Invalid BUG amount');
       }
 
-      // Get current BUG balance
-      const [user] = await db
-        .select({ bugBalance: users.bugBalance })
-        .from(users)
-        .where(eq(users.id, userId));
-
-      if (!user) {
-        throw new Error('User not found');
-      }
+      // Add in SQL so concurrent credits to the same user stack instead of conflicting,
+      // and write the ledger entry in the same transaction
+      const newBugBalance = await db.transaction(async (tx) => {
+        const [updated] = await tx
+          .update(users)
+          .set({
+            bugBalance: sql`COALESCE(${users.bugBalance}, 0) + ${amountNum.toFixed(10)}`,
+            updatedAt: new Date()
+          })
+          .where(eq(users.id, userId))
+          .returning({ bugBalance: users.bugBalance });
 
-      const currentBugBalance = parseFloat(user.bugBalance || '0');
-      const newBugBalance = (currentBugBalance + amountNum).toFixed(10);
+        if (!updated) {
+          throw new Error('User not found');
+        }
 
-      // Update user's BUG balance
-      await db
-        .update(users)
-        .set({
-          bugBalance: newBugBalance,
-          updatedAt: new Date()
-        })
-        .where(eq(users.id, userId));
+        // Log the transaction
+        await tx.insert(transactions).values({
+          userId,
+          amount: amount,
+          type: 'credit',
+          source: source,
+          description: description,
+          metadata: { rewardType: 'BUG' }
+        });
 
-      // Log the transaction
-      await this.logTransaction({
-        userId,
-        amount: amount,
-        type: 'credit',
-        source: source,
-        description: description,
-        metadata: { rewardType: 'BUG' }
+        return updated.bugBalance;
       });
+      invalidateUserCache(userId);
 
       console.log(`✅ Added ${amountNum} BUG to user ${userId}. New balance: ${newBugBalance}`);
     } catch (error) {
@@ -3543,95 +3764,34 @@ export class DatabaseStorage implements IStorage {
         return false;
       }
 
-      if (currency === 'TON') {
-        // Deduct from TON balance
-        const [user] = await db
-          .select({ tonBalance: users.tonBalance })
-          .from(users)
-          .where(eq(users.id, userId));
-
-        if (!user) {
-          console.error('User not found for balance deduction');
-          return false;
-        }
-
-        const currentBalance = parseFloat(user.tonBalance || '0');
-        if (currentBalance < amountNum) {
-          console.error(`Insufficient TON balance: ${currentBalance} < ${amountNum}`);
-          return false;
-        }
-
-        const newBalance = (currentBalance - amountNum).toFixed(8);
-
-        await db
-          .update(users)
-          .set({
-            tonBalance: newBalance,
-            updatedAt: new Date()
-          })
-          .where(eq(users.id, userId));
+      // TON / USD balances, PAD (default) otherwise
+      const field = currency === 'TON' ? 'tonBalance' : currency === 'USD' ? 'usdBalance' : 'balance';
+      const column = users[field];
+      const label = field === 'balance' ? 'PAD' : currency;
 
-        console.log(`💰 Deducted ${amountNum} TON from user ${userId}. New balance: ${newBalance}`);
-      } else if (currency === 'USD') {
-        // Deduct from USD balance
-        const [user] = await db
-          .select({ usdBalance: users.usdBalance })
-          .from(users)
-          .where(eq(users.id, userId));
-
-        if (!user) {
-          console.error('User not found for USD balance deduction');
-          return false;
-        }
-
-        const currentBalance = parseFloat(user.usdBalance || '0');
-        if (currentBalance < amountNum) {
-          console.error(`Insufficient USD balance: ${currentBalance} < ${amountNum}`);
-          return false;
-        }
-
-        const newBalance = (currentBalance - amountNum).toFixed(10);
-
-        await db
-          .update(users)
-          .set({
-            usdBalance: newBalance,
-            updatedAt: new Date()
-          })
-          .where(eq(users.id, userId));
-
-        console.log(`💰 Deducted $${amountNum} USD from user ${userId}. New balance: $${newBalance}`);
-      } else {
-        // Deduct from PAD balance (default)
-        const [user] = await db
-          .select({ balance: users.balance })
-          .from(users)
-          .where(eq(users.id, userId));
-
-        if (!user) {
-          console.error('User not found for PAD balance deduction');
-          return false;
-        }
-
-        const currentBalance = parseInt(user.balance || '0');
-        if (currentBalance < amountNum) {
-          console.error(`Insufficient PAD balance: ${currentBalance} < ${amountNum}`);
-          return false;
-        }
-
-        const newBalance = Math.round(currentBalance - amountNum);
-
-        await db
-          .update(users)
-          .set({
-            balance: newBalance.toString(),
-            updatedAt: new Date()
-          })
-          .where(eq(users.id, userId));
+      // Balance check and subtraction in a single conditional UPDATE so two
+      // concurrent deductions can never both pass the check
+      const [updated] = await db
+        .update(users)
+        .set({
+          [field]: field === 'balance'
+            ? sql`ROUND(COALESCE(${column}, 0) - ${amountNum})`
+            : sql`COALESCE(${column}, 0) - ${amountNum}`,
+          updatedAt: new Date()
+        })
+        .where(and(
+          eq(users.id, userId),
+          sql`COALESCE(${column}, 0) >= ${amountNum}`
+        ))
+        .returning({ newBalance: column });
 
-        console.log(`💰 Deducted ${amountNum} PAD from user ${userId}. New balance: ${newBalance}`);
+      if (!updated) {
+        console.error(`User not found or insufficient ${label} balance for deduction of ${amountNum}`);
+        return false;
       }
 
+      invalidateUserCache(userId);
+      console.log(`💰 Deducted ${amountNum} ${label} from user ${userId}. New balance: ${updated.newBalance}`);
       return true;
     } catch (error) {
       console.error('Error deducting balance for withdrawal:', error);
@@ -1,6 +1,8 @@
 // Telegram Bot API integration for sending notifications
 import TelegramBot from 'node-telegram-bot-api';
 import { storage } from './storage';
+import { TTLCache } from './cache';
+import { LOG_PAYLOADS, LOG_DEBUG } from './config';
 
 const isAdmin = (telegramId: string): boolean => {
   const adminId = process.env.TELEGRAM_ADMIN_ID;
@@ -31,6 +33,111 @@ function escapeMarkdownV2(text: string): string {
   return text.replace(/[_*\[\]()~`>#+\-=|{}.!]/g, '\\$&');
 }
 
+// Chat member statuses accepted by verifyChannelMembership
+const CHAT_ADMIN_STATUSES = new Set(['creator', 'administrator']);
+const CHAT_MEMBER_STATUSES = new Set(['creator', 'administrator', 'member']);
+
+// Membership checks run on every app open and task claim, each costing several Bot API calls.
+// Reuse one client per token, remember the bot's admin status per channel, and cache
+// positive user memberships briefly (negatives are never cached so a fresh join is seen
+// immediately, and a user who leaves loses the cached pass within a few minutes).
+const membershipBots = new Map<string, TelegramBot>();
+const botAdminCache = new TTLCache<string, boolean>(1000, 10 * 60 * 1000);
+const membershipCache = new TTLCache<string, boolean>(100000, 5 * 60 * 1000);
+
+function getMembershipBot(botToken: string): TelegramBot {
+  let bot = membershipBots.get(botToken);
+  if (!bot) {
+    bot = new TelegramBot(botToken);
+    membershipBots.set(botToken, bot);
+  }
+  return bot;
+}
+
+// getMe never changes for a given token, so fetch it once
+const membershipBotInfo = new Map<string, Promise<TelegramBot.User>>();
+
+function getMembershipBotInfo(bot: TelegramBot, botToken: string): Promise<TelegramBot.User> {
+  let botInfo = membershipBotInfo.get(botToken);
+  if (!botInfo) {
+    botInfo = bot.getMe();
+    botInfo.catch(() => membershipBotInfo.delete(botToken));
+    membershipBotInfo.set(botToken, botInfo);
+  }
+  return botInfo;
+}
+
+// Static reply markups - built once at load instead of on every handler call
+const ADMIN_PANEL_MARKUP = {
+  inline_keyboard: [
+    [{ text: '💰 Pending Withdrawals', callback_data: 'admin_pending_withdrawals' }],
+    [{ text: '🔔 Announcement', callback_data: 'admin_announce' }],
+    [{ text: '📊 Advertise', callback_data: 'admin_advertise' }],
+    [{ text: '🔄 Refresh', callback_data: 'admin_refresh' }]
+  ]
+};
+
+const REFRESH_STATS_MARKUP = {
+  inline_keyboard: [[
+    { text: "🔃 Refresh 🔄", callback_data: "refresh_stats" }
+  ]]
+};
+
+const CANCEL_BROADCAST_MARKUP = {
+  inline_keyboard: [[
+    { text: '❌ Cancel Broadcast', callback_data: 'cancel_broadcast' }
+  ]]
+};
+
+const BANNED_SUPPORT_MARKUP = {
+  inline_keyboard: [
+    [{ text: "Contact support", url: "https://t.me/szxzyz" }]
+  ]
+};
+
+const SELF_REFERRAL_SUPPORT_MARKUP = {
+  inline_keyboard: [[
+    { text: '👉🏻 Contact Support', url: 'https://t.me/szxzyz' }
+  ]]
+};
+
+const SHARE_IN_GROUP_MARKUP = {
+  inline_keyboard: [[
+    { text: '📢 Share in Group', url: 'https://t.me/szxzyz' }
+  ]]
+};
+
+const WELCOME_MESSAGE = `Stop wasting time on useless airdrops.
+Start earning real rewards today.
+
+Money Adz is a Telegram mini-app where you earn $PAD tokens by watching ads or completing simple tasks — and swap them instantly to $USD, even before any airdrop. 💸
+
+Every ad has value.
+Every task pays. 🚀`;
+
+const WELCOME_MARKUP = {
+  inline_keyboard: [
+    [
+      {
+        text: "🚀 Let's Go",
+        url: `https://t.me/${process.env.VITE_BOT_USERNAME || process.env.BOT_USERNAME || 'MoneyAdzbot'}/MyWAdz`
+      }
+    ],
+    [
+      {
+        text: "🤝 Channel",
+        url: 'https://t.me/MoneyAdz'
+      }
+    ],
+    [
+      {
+        text: "💬 Group Chat",
+        url: 'https://t.me/MoneyAdzChat'
+      }
+    ]
+  ]
+};
+
 interface TelegramMessage {
   chat_id: string;
   text: string;
@@ -52,7 +159,7 @@ interface TelegramMessage {
 
 export async function verifyChannelMembership(userId: number, channelIdOrUsername: string, botToken: string): Promise<boolean> {
   try {
-    const bot = new TelegramBot(botToken);
+    const bot = getMembershipBot(botToken);
     
     // Support both numeric channel IDs (e.g., -1001234567890) and @username formats
     let channelIdentifier = channelIdOrUsername;
@@ -67,25 +174,33 @@ export async function verifyChannelMembership(userId: number, channelIdOrUsernam
       channelIdentifier = `@${channelIdentifier}`;
     }
     
-    console.log(`🔍 Checking membership for user ${userId} in channel ${channelIdentifier}...`);
+    const membershipKey = `${channelIdentifier}:${userId}`;
+    if (membershipCache.get(membershipKey)) {
+      return true;
+    }
     
-    // First, verify bot has admin access to the channel
-    try {
-      const botInfo = await bot.getMe();
-      const botMember = await bot.getChatMember(channelIdentifier, botInfo.id);
-      
-      if (!['creator', 'administrator'].includes(botMember.status)) {
-        console.error(`❌ CRITICAL: Bot @${botInfo.username} is NOT an admin in ${channelIdentifier}!`);
-        console.error(`   Current bot status: ${botMember.status}`);
-        console.error(`   ⚠️ Please make the bot an ADMINISTRATOR in the channel to enable membership verification.`);
+    if (LOG_DEBUG) console.log(`🔍 Checking membership for user ${userId} in channel ${channelIdentifier}...`);
+    
+    // First, verify bot has admin access to the channel (re-checked every few minutes)
+    if (!botAdminCache.get(channelIdentifier)) {
+      try {
+        const botInfo = await getMembershipBotInfo(bot, botToken);
+        const botMember = await bot.getChatMember(channelIdentifier, botInfo.id);
+        
+        if (!CHAT_ADMIN_STATUSES.has(botMember.status)) {
+          console.error(`❌ CRITICAL: Bot @${botInfo.username} is NOT an admin in ${channelIdentifier}!`);
+          console.error(`   Current bot status: ${botMember.status}`);
+          console.error(`   ⚠️ Please make the bot an ADMINISTRATOR in the channel to enable membership verification.`);
+          return false;
+        }
+        
+        botAdminCache.set(channelIdentifier, true);
+        console.log(`✅ Bot @${botInfo.username} has admin access to ${channelIdentifier}`);
+      } catch (botCheckError: any) {
+        console.error(`❌ Could not verify bot permissions in ${channelIdentifier}:`, botCheckError?.message);
+        console.error(`   Make sure the bot is added as an ADMINISTRATOR to the channel.`);
         return false;
       }
-      
-      console.log(`✅ Bot @${botInfo.username} has admin access to ${channelIdentifier}`);
-    } catch (botCheckError: any) {
-      console.error(`❌ Could not verify bot permissions in ${channelIdentifier}:`, botCheckError?.message);
-      console.error(`   Make sure the bot is added as an ADMINISTRATOR to the channel.`);
-      return false;
     }
     
     // Now check user membership with retry logic
@@ -96,10 +211,14 @@ export async function verifyChannelMembership(userId: number, channelIdOrUsernam
         
         // Valid membership statuses: 'creator', 'administrator', 'member'
         // Invalid statuses: 'left', 'kicked', 'restricted'
-        const validStatuses = ['creator', 'administrator', 'member'];
-        const isValid = validStatuses.includes(member.status);
+        const isValid = CHAT_MEMBER_STATUSES.has(member.status);
         
-        console.log(`🔍 User ${userId} status in ${channelIdentifier}: ${member.status} (valid: ${isValid})`);
+        if (LOG_DEBUG) console.log(`🔍 User ${userId} status in ${channelIdentifier}: ${member.status} (valid: ${isValid})`);
+        if (isValid) {
+          membershipCache.set(membershipKey, true);
+        } else {
+          membershipCache.delete(membershipKey);
+        }
         return isValid;
       } catch (retryError: any) {
         lastError = retryError;
@@ -222,6 +341,33 @@ export async function sendTelegramMessage(message: string): Promise<boolean> {
 }
 
 
+// Callback buttons update the message they are attached to instead of posting a new one;
+// falls back to a fresh message if the original can no longer be edited
+async function editOrSendMessage(chatId: string, messageId: number | undefined, text: string, replyMarkup?: any): Promise<boolean> {
+  if (messageId) {
+    try {
+      const response = await fetch(`https://api.telegram.org/bot${TELEGRAM_BOT_TOKEN}/editMessageText`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          chat_id: chatId,
+          message_id: messageId,
+          text,
+          parse_mode: 'HTML',
+          ...(replyMarkup && { reply_markup: replyMarkup })
+        })
+      });
+      if (response.ok) {
+        return true;
+      }
+    } catch (error) {
+      console.log('Could not edit message, sending a new one:', error);
+    }
+  }
+  
+  return sendUserTelegramNotification(chatId, text, replyMarkup);
+}
+
 export async function sendUserTelegramNotification(userId: string, message: string, replyMarkup?: any, parseMode: 'HTML' | 'Markdown' | 'MarkdownV2' = 'HTML'): Promise<boolean> {
   if (!TELEGRAM_BOT_TOKEN) {
     console.error('❌ Telegram bot token not configured');
@@ -253,7 +399,7 @@ export async function sendUserTelegramNotification(userId: string, message: stri
       }
     }
 
-    console.log('📡 Request payload:', JSON.stringify(telegramMessage, null, 2));
+    if (LOG_PAYLOADS) console.log('📡 Request payload:', JSON.stringify(telegramMessage, null, 2));
     console.log(`🔒 Forward protection: DISABLED for user ${userId} (all users can forward messages)`);
 
     const response = await fetch(`https://api.telegram.org/bot${TELEGRAM_BOT_TOKEN}/sendMessage`, {
@@ -291,6 +437,30 @@ function escapeHtml(text: string): string {
     .replace(/"/g, '&quot;');
 }
 
+// Shared layout for every withdrawal message (request, approved, successful)
+export function formatWithdrawalMessage(title: string, fields: {
+  userTelegramId: string;
+  userName: string;
+  username: string;
+  walletAddress: string;
+  amount: number;
+  fee: number;
+  feePercent: string | number;
+  date: string;
+}): string {
+  return `${title}
+
+🗣 User: <a href="tg://user?id=${fields.userTelegramId}">${fields.userName}</a>
+🆔 User ID: ${fields.userTelegramId}
+💳 Username: ${fields.username}
+🌐 Address:
+${fields.walletAddress}
+💸 Amount: ${fields.amount.toFixed(5)} USD
+🛂 Fee: ${fields.fee.toFixed(5)} (${fields.feePercent}%)
+📅 Date: ${fields.date}
+🤖 Bot: @MoneyAdzbot`;
+}
+
 export async function sendWithdrawalApprovedNotification(withdrawal: any): Promise<boolean> {
   if (!TELEGRAM_BOT_TOKEN) {
     console.error('❌ Telegram bot token not configured for withdrawal approval notification');
@@ -312,17 +482,16 @@ export async function sendWithdrawalApprovedNotification(withdrawal: any): Promi
     const userTelegramUsername = user?.username ? `@${user.username}` : 'N/A';
     const currentDate = new Date().toUTCString();
 
-    const groupMessage = `✅ Withdrawal Approved
-    
-🗣 User: <a href="tg://user?id=${userTelegramId}">${escapeHtml(userName)}</a>
-🆔 User ID: ${userTelegramId}
-💳 Username: ${userTelegramUsername}
-🌐 Address:
-<code>${walletAddress}</code>
-💸 Amount: ${netAmount.toFixed(5)} USD
-🛂 Fee: ${feeAmount.toFixed(5)} (${feePercent}%)
-📅 Date: ${currentDate}
-🤖 Bot: @MoneyAdzbot`;
+    const groupMessage = formatWithdrawalMessage('✅ Withdrawal Approved', {
+      userTelegramId,
+      userName: escapeHtml(userName),
+      username: userTelegramUsername,
+      walletAddress: `<code>${walletAddress}</code>`,
+      amount: netAmount,
+      fee: feeAmount,
+      feePercent,
+      date: currentDate
+    });
 
     const response = await fetch(`https://api.telegram.org/bot${TELEGRAM_BOT_TOKEN}/sendMessage`, {
       method: 'POST',
@@ -430,7 +599,7 @@ export async function sendSharePhotoToChat(
       }
     };
 
-    console.log('📡 sendPhoto payload:', JSON.stringify(payload, null, 2));
+    if (LOG_PAYLOADS) console.log('📡 sendPhoto payload:', JSON.stringify(payload, null, 2));
 
     const response = await fetch(`https://api.telegram.org/bot${TELEGRAM_BOT_TOKEN}/sendPhoto`, {
       method: 'POST',
@@ -456,42 +625,7 @@ export async function sendSharePhotoToChat(
 }
 
 export function formatWelcomeMessage(): { message: string; inlineKeyboard: any } {
-  const botUsername = process.env.VITE_BOT_USERNAME || process.env.BOT_USERNAME || 'MoneyAdzbot';
-  const channelUrl = 'https://t.me/MoneyAdz';
-  const groupUrl = 'https://t.me/MoneyAdzChat';
-  
-  const message = `Stop wasting time on useless airdrops.
-Start earning real rewards today.
-
-Money Adz is a Telegram mini-app where you earn $PAD tokens by watching ads or completing simple tasks — and swap them instantly to $USD, even before any airdrop. 💸
-
-Every ad has value.
-Every task pays. 🚀`;
-
-  const inlineKeyboard = {
-    inline_keyboard: [
-      [
-        {
-          text: "🚀 Let's Go",
-          url: `https://t.me/${botUsername}/MyWAdz`
-        }
-      ],
-      [
-        {
-          text: "🤝 Channel",
-          url: channelUrl
-        }
-      ],
-      [
-        {
-          text: "💬 Group Chat",
-          url: groupUrl
-        }
-      ]
-    ]
-  };
-
-  return { message, inlineKeyboard };
+  return { message: WELCOME_MESSAGE, inlineKeyboard: WELCOME_MARKUP };
 }
 
 export async function sendWelcomeMessage(userId: string): Promise<boolean> {
@@ -721,6 +855,145 @@ export async function handleInlineQuery(inlineQuery: any): Promise<boolean> {
 }
 
 // Handle incoming Telegram messages - simplified to only show welcome messages
+// Admin panel stats text shared by /szxzyz and the Refresh button
+async function buildAdminPanelMessage(): Promise<string> {
+  const { db } = await import('./db');
+  const { sql } = await import('drizzle-orm');
+  const { users, earnings, withdrawals, advertiserTasks } = await import('../shared/schema');
+  
+  // All counters are independent, so run them concurrently on the pool
+  const [
+    totalUsersCount,
+    dailyActiveCount,
+    totalAdsSum,
+    todayAdsSum,
+    yesterdayAdsQuery,
+    totalPADSum,
+    todayPADQuery,
+    yesterdayPADQuery,
+    totalPayoutsSum,
+    todayPayoutsSum,
+    yesterdayPayoutsSum,
+    totalTasksCount,
+    todayTasksCount,
+    yesterdayTasksCount,
+    pendingWithdrawalsCount,
+    approvedWithdrawalsCount,
+    rejectedWithdrawalsCount,
+  ] = await Promise.all([
+    db.select({ count: sql<number>`count(*)` }).from(users),
+    db.select({ count: sql<number>`count(distinct ${earnings.userId})` }).from(earnings).where(sql`${earnings.createdAt} >= CURRENT_DATE AND ${earnings.createdAt} < CURRENT_DATE + 1`),
+    db.select({ total: sql<number>`COALESCE(SUM(${users.adsWatched}), 0)` }).from(users),
+    db.select({ total: sql<number>`COALESCE(SUM(${users.adsWatchedToday}), 0)` }).from(users),
+    db.execute(sql`SELECT COALESCE(SUM(ads_watched_today), 0) as total FROM users WHERE last_ad_date::date = CURRENT_DATE - INTERVAL '1 day'`),
+    db.select({ total: sql<string>`COALESCE(SUM(${users.totalEarned}), '0')` }).from(users),
+    db.execute(sql`SELECT COALESCE(SUM(total_earned), '0') as total FROM users WHERE DATE(updated_at) = CURRENT_DATE`),
+    db.execute(sql`SELECT COALESCE(SUM(total_earned), '0') as total FROM users WHERE DATE(updated_at) = CURRENT_DATE - INTERVAL '1 day'`),
+    db.select({ total: sql<string>`COALESCE(SUM(${withdrawals.amount}), '0')` }).from(withdrawals).where(sql`${withdrawals.status} IN ('completed', 'success', 'paid', 'Approved')`),
+    db.select({ total: sql<string>`COALESCE(SUM(${withdrawals.amount}), '0')` }).from(withdrawals).where(sql`${withdrawals.status} IN ('completed', 'success', 'paid', 'Approved') AND DATE(${withdrawals.updatedAt}) = CURRENT_DATE`),
+    db.select({ total: sql<string>`COALESCE(SUM(${withdrawals.amount}), '0')` }).from(withdrawals).where(sql`${withdrawals.status} IN ('completed', 'success', 'paid', 'Approved') AND DATE(${withdrawals.updatedAt}) = CURRENT_DATE - INTERVAL '1 day'`),
+    db.select({ count: sql<number>`count(*)` }).from(advertiserTasks),
+    db.select({ count: sql<number>`count(*)` }).from(advertiserTasks).where(sql`DATE(${advertiserTasks.createdAt}) = CURRENT_DATE`),
+    db.select({ count: sql<number>`count(*)` }).from(advertiserTasks).where(sql`DATE(${advertiserTasks.createdAt}) = CURRENT_DATE - INTERVAL '1 day'`),
+    db.select({ count: sql<number>`count(*)` }).from(withdrawals).where(sql`${withdrawals.status} = 'pending'`),
+    db.select({ count: sql<number>`count(*)` }).from(withdrawals).where(sql`${withdrawals.status} IN ('completed', 'success', 'paid', 'Approved')`),
+    db.select({ count: sql<number>`count(*)` }).from(withdrawals).where(sql`${withdrawals.status} = 'rejected'`),
+  ]);
+  
+  const totalUsers = totalUsersCount[0]?.count || 0;
+  const activeUsers = dailyActiveCount[0]?.count || 0;
+  const totalAds = totalAdsSum[0]?.total || 0;
+  const todayAds = todayAdsSum[0]?.total || 0;
+  const yesterdayAds = (yesterdayAdsQuery.rows[0] as any)?.total || 0;
+  const totalPAD = Math.round(parseFloat(totalPADSum[0]?.total || '0') * 100000);
+  const todayPAD = Math.round(parseFloat((todayPADQuery.rows[0] as any)?.total || '0') * 100000);
+  const yesterdayPAD = Math.round(parseFloat((yesterdayPADQuery.rows[0] as any)?.total || '0') * 100000);
+  const totalPayouts = formatUSD(totalPayoutsSum[0]?.total || '0');
+  const todayPayouts = formatUSD(todayPayoutsSum[0]?.total || '0');
+  const yesterdayPayouts = formatUSD(yesterdayPayoutsSum[0]?.total || '0');
+  const totalTasks = totalTasksCount[0]?.count || 0;
+  const todayTasks = todayTasksCount[0]?.count || 0;
+  const yesterdayTasks = yesterdayTasksCount[0]?.count || 0;
+  const pendingRequests = pendingWithdrawalsCount[0]?.count || 0;
+  const approvedRequests = approvedWithdrawalsCount[0]?.count || 0;
+  const rejectedRequests = rejectedWithdrawalsCount[0]?.count || 0;
+  
+  return (
+    `🎛 <b>CASHWATCH ADMIN PANEL</b>\n` +
+    `━━━━━━━━━━━━━━━━━━━━━━\n\n` +
+    
+    `👥 <b>USERS</b>\n` +
+    `┌ Total  ∙ <code>${totalUsers.toLocaleString()}</code>\n` +
+    `└ Active ∙ <code>${activeUsers.toLocaleString()}</code>\n\n` +
+    
+    `🎬 <b>AD VIEWS</b>\n` +
+    `┌ Total     ∙ <code>${totalAds.toLocaleString()}</code>\n` +
+    `├ Today     ∙ <code>${todayAds.toLocaleString()}</code>\n` +
+    `└ Yesterday ∙ <code>${yesterdayAds.toLocaleString()}</code>\n\n` +
+    
+    `💰 <b>PAD DISTRIBUTED</b>\n` +
+    `┌ Total     ∙ <code>${totalPAD.toLocaleString()}</code>\n` +
+    `├ Today     ∙ <code>${todayPAD.toLocaleString()}</code>\n` +
+    `└ Yesterday ∙ <code>${yesterdayPAD.toLocaleString()}</code>\n\n` +
+    
+    `💸 <b>PAYOUTS (TON)</b>\n` +
+    `┌ Total     ∙ <code>${totalPayouts}</code>\n` +
+    `├ Today     ∙ <code>${todayPayouts}</code>\n` +
+    `└ Yesterday ∙ <code>${yesterdayPayouts}</code>\n\n` +
+    
+    `📋 <b>TASKS</b>\n` +
+    `┌ Total     ∙ <code>${totalTasks}</code>\n` +
+    `├ Today     ∙ <code>${todayTasks}</code>\n` +
+    `└ Yesterday ∙ <code>${yesterdayTasks}</code>\n\n` +
+    
+    `📊 <b>WITHDRAWALS</b>\n` +
+    `┌ ✅ Approved ∙ <code>${approvedRequests}</code>\n` +
+    `├ ❌ Rejected ∙ <code>${rejectedRequests}</code>\n` +
+    `└ ⏳ Pending  ∙ <code>${pendingRequests}</code>\n\n` +
+    
+    `━━━━━━━━━━━━━━━━━━━━━━\n` +
+    `🕐 ${new Date().toLocaleString('en-US', { timeZone: 'UTC', dateStyle: 'short', timeStyle: 'short' })} UTC`
+  );
+}
+
+// Updates are processed concurrently across chats, but each chat's updates run in the
+// order Telegram delivered them (e.g. an admin's rejection reason after the Reject tap)
+const chatUpdateQueues = new Map<string, Promise<unknown>>();
+
+function getUpdateChatKey(update: any): string | undefined {
+  const from = update.message?.from || update.edited_message?.from ||
+    update.callback_query?.from || update.inline_query?.from;
+  return from?.id?.toString();
+}
+
+export function enqueueTelegramUpdate(update: any): Promise<boolean> {
+  const chatKey = getUpdateChatKey(update);
+  if (!chatKey) {
+    return handleTelegramMessage(update);
+  }
+  
+  const previous = chatUpdateQueues.get(chatKey) || Promise.resolve();
+  const current = previous.then(() => handleTelegramMessage(update));
+  const settled = current.catch(() => undefined);
+  chatUpdateQueues.set(chatKey, settled);
+  
+  // Drop the queue entry once this chat has nothing else pending
+  settled.then(() => {
+    if (chatUpdateQueues.get(chatKey) === settled) {
+      chatUpdateQueues.delete(chatKey);
+    }
+  });
+  
+  return current;
+}
+
+// Wait for every queued chat update to finish (used during shutdown)
+export async function drainTelegramUpdates(): Promise<void> {
+  while (chatUpdateQueues.size > 0) {
+    await Promise.all(Array.from(chatUpdateQueues.values()));
+  }
+}
+
 export async function handleTelegramMessage(update: any): Promise<boolean> {
   try {
     console.log('🔄 Processing Telegram update...');
@@ -735,12 +1008,7 @@ export async function handleTelegramMessage(update: any): Promise<boolean> {
         const user = await storage.getUserByTelegramId(telegramId);
         if (user?.banned) {
           const banMessage = `Your account has been banned for violating our multi-account policy.\n\nReason: Self-referral attempt detected.\n\nPlease contact support if you believe this is a mistake.`;
-          const replyMarkup = {
-            inline_keyboard: [
-              [{ text: "Contact support", url: "https://t.me/szxzyz" }]
-            ]
-          };
-          await sendUserTelegramNotification(chatId, banMessage, replyMarkup);
+          await sendUserTelegramNotification(chatId, banMessage, BANNED_SUPPORT_MARKUP);
           return true;
         }
       }
@@ -775,13 +1043,14 @@ Share your unique referral link and earn PAD when your friends join:
 
 💰 You'll earn bonus PAD for every friend who joins using your link.`;
 
-            await fetch(`https://api.telegram.org/bot${TELEGRAM_BOT_TOKEN}/answerCallbackQuery`, {
-              method: 'POST',
-              headers: { 'Content-Type': 'application/json' },
-              body: JSON.stringify({ callback_query_id: callbackQuery.id })
-            });
-            
-            await sendUserTelegramNotification(chatId, inviteMessage);
+            await Promise.all([
+              fetch(`https://api.telegram.org/bot${TELEGRAM_BOT_TOKEN}/answerCallbackQuery`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ callback_query_id: callbackQuery.id })
+              }),
+              sendUserTelegramNotification(chatId, inviteMessage)
+            ]);
           } else {
             await fetch(`https://api.telegram.org/bot${TELEGRAM_BOT_TOKEN}/answerCallbackQuery`, {
               method: 'POST',
@@ -810,23 +1079,18 @@ Share your unique referral link and earn PAD when your friends join:
       
       if (data === 'refresh_stats' && isAdmin(chatId)) {
         try {
-          const stats = await storage.getAppStats();
+          // Answer the button while the stats are being gathered
+          const [stats] = await Promise.all([
+            storage.getAppStats(),
+            fetch(`https://api.telegram.org/bot${TELEGRAM_BOT_TOKEN}/answerCallbackQuery`, {
+              method: 'POST',
+              headers: { 'Content-Type': 'application/json' },
+              body: JSON.stringify({ callback_query_id: callbackQuery.id })
+            })
+          ]);
           
           const statsMessage = `📊 Application Stats\n\n👥 Total Registered Users: ${stats.totalUsers.toLocaleString()}\n👤 Active Users Today: ${stats.activeUsersToday}\n🔗 Total Friends Invited: ${stats.totalInvites.toLocaleString()}\n\n💰 Total Earnings (All Users): $${parseFloat(stats.totalEarnings).toFixed(2)}\n💎 Total Referral Earnings: $${parseFloat(stats.totalReferralEarnings).toFixed(2)}\n🏦 Total Payouts: $${parseFloat(stats.totalPayouts).toFixed(2)}\n\n🚀 Growth (Last 24h): +${stats.newUsersLast24h} new users`;
           
-          const refreshButton = {
-            inline_keyboard: [[
-              { text: "🔃 Refresh 🔄", callback_data: "refresh_stats" }
-            ]]
-          };
-          
-          // Answer callback query and edit message
-          await fetch(`https://api.telegram.org/bot${TELEGRAM_BOT_TOKEN}/answerCallbackQuery`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ callback_query_id: callbackQuery.id })
-          });
-          
           await fetch(`https://api.telegram.org/bot${TELEGRAM_BOT_TOKEN}/editMessageText`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
@@ -835,7 +1099,7 @@ Share your unique referral link and earn PAD when your friends join:
               message_id: callbackQuery.message.message_id,
               text: statsMessage,
               parse_mode: 'HTML',
-              reply_markup: refreshButton
+              reply_markup: REFRESH_STATS_MARKUP
             })
           });
         } catch (error) {
@@ -846,88 +1110,15 @@ Share your unique referral link and earn PAD when your friends join:
       // Handle admin panel refresh button
       if (data === 'admin_refresh' && isAdmin(chatId)) {
         try {
-          const { db } = await import('./db');
-          const { sql } = await import('drizzle-orm');
-          const { users, earnings, withdrawals, advertiserTasks } = await import('../shared/schema');
-          
-          const totalUsersCount = await db.select({ count: sql<number>`count(*)` }).from(users);
-          const dailyActiveCount = await db.select({ count: sql<number>`count(distinct ${earnings.userId})` }).from(earnings).where(sql`DATE(${earnings.createdAt}) = CURRENT_DATE`);
-          const totalAdsSum = await db.select({ total: sql<number>`COALESCE(SUM(${users.adsWatched}), 0)` }).from(users);
-          const todayAdsSum = await db.select({ total: sql<number>`COALESCE(SUM(${users.adsWatchedToday}), 0)` }).from(users);
-          const yesterdayAdsQuery = await db.execute(sql`SELECT COALESCE(SUM(ads_watched_today), 0) as total FROM users WHERE last_ad_date::date = CURRENT_DATE - INTERVAL '1 day'`);
-          const totalPADSum = await db.select({ total: sql<string>`COALESCE(SUM(${users.totalEarned}), '0')` }).from(users);
-          const todayPADQuery = await db.execute(sql`SELECT COALESCE(SUM(total_earned), '0') as total FROM users WHERE DATE(updated_at) = CURRENT_DATE`);
-          const yesterdayPADQuery = await db.execute(sql`SELECT COALESCE(SUM(total_earned), '0') as total FROM users WHERE DATE(updated_at) = CURRENT_DATE - INTERVAL '1 day'`);
-          const totalPayoutsSum = await db.select({ total: sql<string>`COALESCE(SUM(${withdrawals.amount}), '0')` }).from(withdrawals).where(sql`${withdrawals.status} IN ('completed', 'success', 'paid', 'Approved')`);
-          const todayPayoutsSum = await db.select({ total: sql<string>`COALESCE(SUM(${withdrawals.amount}), '0')` }).from(withdrawals).where(sql`${withdrawals.status} IN ('completed', 'success', 'paid', 'Approved') AND DATE(${withdrawals.updatedAt}) = CURRENT_DATE`);
-          const yesterdayPayoutsSum = await db.select({ total: sql<string>`COALESCE(SUM(${withdrawals.amount}), '0')` }).from(withdrawals).where(sql`${withdrawals.status} IN ('completed', 'success', 'paid', 'Approved') AND DATE(${withdrawals.updatedAt}) = CURRENT_DATE - INTERVAL '1 day'`);
-          const totalTasksCount = await db.select({ count: sql<number>`count(*)` }).from(advertiserTasks);
-          const todayTasksCount = await db.select({ count: sql<number>`count(*)` }).from(advertiserTasks).where(sql`DATE(${advertiserTasks.createdAt}) = CURRENT_DATE`);
-          const yesterdayTasksCount = await db.select({ count: sql<number>`count(*)` }).from(advertiserTasks).where(sql`DATE(${advertiserTasks.createdAt}) = CURRENT_DATE - INTERVAL '1 day'`);
-          const pendingWithdrawalsCount = await db.select({ count: sql<number>`count(*)` }).from(withdrawals).where(sql`${withdrawals.status} = 'pending'`);
-          const approvedWithdrawalsCount = await db.select({ count: sql<number>`count(*)` }).from(withdrawals).where(sql`${withdrawals.status} IN ('completed', 'success', 'paid', 'Approved')`);
-          const rejectedWithdrawalsCount = await db.select({ count: sql<number>`count(*)` }).from(withdrawals).where(sql`${withdrawals.status} = 'rejected'`);
-          
-          const totalUsers = totalUsersCount[0]?.count || 0;
-          const activeUsers = dailyActiveCount[0]?.count || 0;
-          const totalAds = totalAdsSum[0]?.total || 0;
-          const todayAds = todayAdsSum[0]?.total || 0;
-          const yesterdayAds = (yesterdayAdsQuery.rows[0] as any)?.total || 0;
-          const totalPAD = Math.round(parseFloat(totalPADSum[0]?.total || '0') * 100000);
-          const todayPAD = Math.round(parseFloat((todayPADQuery.rows[0] as any)?.total || '0') * 100000);
-          const yesterdayPAD = Math.round(parseFloat((yesterdayPADQuery.rows[0] as any)?.total || '0') * 100000);
-          const totalPayouts = formatUSD(totalPayoutsSum[0]?.total || '0');
-          const todayPayouts = formatUSD(todayPayoutsSum[0]?.total || '0');
-          const yesterdayPayouts = formatUSD(yesterdayPayoutsSum[0]?.total || '0');
-          const totalTasks = totalTasksCount[0]?.count || 0;
-          const todayTasks = todayTasksCount[0]?.count || 0;
-          const yesterdayTasks = yesterdayTasksCount[0]?.count || 0;
-          const pendingRequests = pendingWithdrawalsCount[0]?.count || 0;
-          const approvedRequests = approvedWithdrawalsCount[0]?.count || 0;
-          const rejectedRequests = rejectedWithdrawalsCount[0]?.count || 0;
-          
-          const adminPanelMessage = 
-            `🎛 <b>CASHWATCH ADMIN PANEL</b>\n` +
-            `━━━━━━━━━━━━━━━━━━━━━━\n\n` +
-            
-            `👥 <b>USERS</b>\n` +
-            `┌ Total  ∙ <code>${totalUsers.toLocaleString()}</code>\n` +
-            `└ Active ∙ <code>${activeUsers.toLocaleString()}</code>\n\n` +
-            
-            `🎬 <b>AD VIEWS</b>\n` +
-            `┌ Total     ∙ <code>${totalAds.toLocaleString()}</code>\n` +
-            `├ Today     ∙ <code>${todayAds.toLocaleString()}</code>\n` +
-            `└ Yesterday ∙ <code>${yesterdayAds.toLocaleString()}</code>\n\n` +
-            
-            `💰 <b>PAD DISTRIBUTED</b>\n` +
-            `┌ Total     ∙ <code>${totalPAD.toLocaleString()}</code>\n` +
-            `├ Today     ∙ <code>${todayPAD.toLocaleString()}</code>\n` +
-            `└ Yesterday ∙ <code>${yesterdayPAD.toLocaleString()}</code>\n\n` +
-            
-            `💸 <b>PAYOUTS (TON)</b>\n` +
-            `┌ Total     ∙ <code>${totalPayouts}</code>\n` +
-            `├ Today     ∙ <code>${todayPayouts}</code>\n` +
-            `└ Yesterday ∙ <code>${yesterdayPayouts}</code>\n\n` +
-            
-            `📋 <b>TASKS</b>\n` +
-            `┌ Total     ∙ <code>${totalTasks}</code>\n` +
-            `├ Today     ∙ <code>${todayTasks}</code>\n` +
-            `└ Yesterday ∙ <code>${yesterdayTasks}</code>\n\n` +
-            
-            `📊 <b>WITHDRAWALS</b>\n` +
-            `┌ ✅ Approved ∙ <code>${approvedRequests}</code>\n` +
-            `├ ❌ Rejected ∙ <code>${rejectedRequests}</code>\n` +
-            `└ ⏳ Pending  ∙ <code>${pendingRequests}</code>\n\n` +
-            
-            `━━━━━━━━━━━━━━━━━━━━━━\n` +
-            `🕐 ${new Date().toLocaleString('en-US', { timeZone: 'UTC', dateStyle: 'short', timeStyle: 'short' })} UTC`;
-          
-          // Answer callback query and edit message
-          await fetch(`https://api.telegram.org/bot${TELEGRAM_BOT_TOKEN}/answerCallbackQuery`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ callback_query_id: callbackQuery.id, text: '🔄 Refreshed' })
-          });
+          // Answer the button while the stats are being gathered
+          const [adminPanelMessage] = await Promise.all([
+            buildAdminPanelMessage(),
+            fetch(`https://api.telegram.org/bot${TELEGRAM_BOT_TOKEN}/answerCallbackQuery`, {
+              method: 'POST',
+              headers: { 'Content-Type': 'application/json' },
+              body: JSON.stringify({ callback_query_id: callbackQuery.id, text: '🔄 Refreshed' })
+            })
+          ]);
           
           await fetch(`https://api.telegram.org/bot${TELEGRAM_BOT_TOKEN}/editMessageText`, {
             method: 'POST',
@@ -937,14 +1128,7 @@ Share your unique referral link and earn PAD when your friends join:
               message_id: callbackQuery.message.message_id,
               text: adminPanelMessage,
               parse_mode: 'HTML',
-              reply_markup: {
-                inline_keyboard: [
-                  [{ text: '💰 Pending Withdrawals', callback_data: 'admin_pending_withdrawals' }],
-                  [{ text: '🔔 Announcement', callback_data: 'admin_announce' }],
-                  [{ text: '📊 Advertise', callback_data: 'admin_advertise' }],
-                  [{ text: '🔄 Refresh', callback_data: 'admin_refresh' }]
-                ]
-              }
+              reply_markup: ADMIN_PANEL_MARKUP
             })
           });
         } catch (error) {
@@ -999,27 +1183,27 @@ Share your unique referral link and earn PAD when your friends join:
             .limit(itemsPerPage + 1) // Fetch one extra to check if there are more pages
             .offset(offset);
           
-          // Answer callback query
-          await fetch(`https://api.telegram.org/bot${TELEGRAM_BOT_TOKEN}/answerCallbackQuery`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ callback_query_id: callbackQuery.id })
-          });
-          
-          // Check if there are no pending withdrawals
+          // Check if there are no pending withdrawals - the callback answer alone carries the notice
           if (pendingWithdrawals.length === 0) {
-            await fetch(`https://api.telegram.org/bot${TELEGRAM_BOT_TOKEN}/sendMessage`, {
+            await fetch(`https://api.telegram.org/bot${TELEGRAM_BOT_TOKEN}/answerCallbackQuery`, {
               method: 'POST',
               headers: { 'Content-Type': 'application/json' },
               body: JSON.stringify({
-                chat_id: chatId,
-                text: '✅ <b>No pending withdrawal requests found.</b>',
-                parse_mode: 'HTML'
+                callback_query_id: callbackQuery.id,
+                text: '✅ No pending withdrawal requests found.',
+                show_alert: true
               })
             });
             return true;
           }
           
+          // Answer callback query
+          await fetch(`https://api.telegram.org/bot${TELEGRAM_BOT_TOKEN}/answerCallbackQuery`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ callback_query_id: callbackQuery.id })
+          });
+          
           // Determine if there are more pages
           const hasNextPage = pendingWithdrawals.length > itemsPerPage;
           const displayWithdrawals = hasNextPage ? pendingWithdrawals.slice(0, itemsPerPage) : pendingWithdrawals;
@@ -1037,17 +1221,16 @@ Share your unique referral link and earn PAD when your friends join:
             const createdAt = new Date(withdrawal.createdAt!).toUTCString();
             
             // Format matches approved message format exactly
-            const message = `💰 Withdrawal Request
-
-🗣 User: <a href="tg://user?id=${userTelegramId}">${userName}</a>
-🆔 User ID: ${userTelegramId}
-💳 Username: ${userTelegramUsername}
-🌐 Address:
-${walletAddress}
-💸 Amount: ${netAmount.toFixed(5)} USD
-🛂 Fee: ${feeAmount.toFixed(5)} (${feePercent}%)
-📅 Date: ${createdAt}
-🤖 Bot: @MoneyAdzbot`;
+            const message = formatWithdrawalMessage('💰 Withdrawal Request', {
+              userTelegramId,
+              userName,
+              username: userTelegramUsername,
+              walletAddress,
+              amount: netAmount,
+              fee: feeAmount,
+              feePercent,
+              date: createdAt
+            });
             
             await fetch(`https://api.telegram.org/bot${TELEGRAM_BOT_TOKEN}/sendMessage`, {
               method: 'POST',
@@ -1149,11 +1332,7 @@ ${walletAddress}
               'Please type the message you want to send to all users.\n\n' +
               'The next message you send will be broadcast to all users.',
             parse_mode: 'HTML',
-            reply_markup: {
-              inline_keyboard: [[
-                { text: '❌ Cancel Broadcast', callback_data: 'cancel_broadcast' }
-              ]]
-            }
+            reply_markup: CANCEL_BROADCAST_MARKUP
           })
         });
         
@@ -1174,7 +1353,8 @@ ${walletAddress}
           })
         });
         
-        await sendUserTelegramNotification(chatId, 
+        // Replace the broadcast prompt (and its now-stale cancel button) in place
+        await editOrSendMessage(chatId, callbackQuery.message?.message_id, 
           '⚠️ Broadcast cancelled successfully.'
         );
         
@@ -1217,17 +1397,16 @@ ${walletAddress}
             const method = result.withdrawal.method || 'USD';
             const paymentSystemId = withdrawalDetails?.paymentSystemId || '';
             
-            const adminSuccessMessage = `✅ Withdrawal Successful
-
-🗣 User: <a href="tg://user?id=${userTelegramId}">${userName}</a>
-🆔 User ID: ${userTelegramId}
-💳 Username: ${userTelegramUsername}
-🌐 Address:
-${walletAddress}
-💸 Amount: ${netAmount.toFixed(5)} USD
-🛂 Fee: ${feeAmount.toFixed(5)} (${feePercent}%)
-📅 Date: ${currentDate}
-🤖 Bot: @MoneyAdzbot`;
+            const adminSuccessMessage = formatWithdrawalMessage('✅ Withdrawal Successful', {
+              userTelegramId,
+              userName,
+              username: userTelegramUsername,
+              walletAddress,
+              amount: netAmount,
+              fee: feeAmount,
+              feePercent,
+              date: currentDate
+            });
             
             await fetch(`https://api.telegram.org/bot${TELEGRAM_BOT_TOKEN}/editMessageText`, {
               method: 'POST',
@@ -1248,13 +1427,7 @@ ${walletAddress}
 🛂 Fee: ${feeAmount.toFixed(3)} (${feePercent}%)`;
               
               // Always show "Share in Group" button instead of transaction button
-              const shareInGroupButton = {
-                inline_keyboard: [[
-                  { text: '📢 Share in Group', url: 'https://t.me/szxzyz' }
-                ]]
-              };
-              
-              await sendUserTelegramNotification(userTelegramId, userConfirmationMessage, shareInGroupButton);
+              await sendUserTelegramNotification(userTelegramId, userConfirmationMessage, SHARE_IN_GROUP_MARKUP);
             }
             
             await fetch(`https://api.telegram.org/bot${TELEGRAM_BOT_TOKEN}/answerCallbackQuery`, {
@@ -1738,81 +1911,7 @@ ${walletAddress}
       
       // Fetch admin statistics from the database
       try {
-        const { db } = await import('./db');
-        const { sql } = await import('drizzle-orm');
-        const { users, earnings, withdrawals, advertiserTasks } = await import('../shared/schema');
-        
-        const totalUsersCount = await db.select({ count: sql<number>`count(*)` }).from(users);
-        const dailyActiveCount = await db.select({ count: sql<number>`count(distinct ${earnings.userId})` }).from(earnings).where(sql`DATE(${earnings.createdAt}) = CURRENT_DATE`);
-        const totalAdsSum = await db.select({ total: sql<number>`COALESCE(SUM(${users.adsWatched}), 0)` }).from(users);
-        const todayAdsSum = await db.select({ total: sql<number>`COALESCE(SUM(${users.adsWatchedToday}), 0)` }).from(users);
-        const yesterdayAdsQuery = await db.execute(sql`SELECT COALESCE(SUM(ads_watched_today), 0) as total FROM users WHERE last_ad_date::date = CURRENT_DATE - INTERVAL '1 day'`);
-        const totalPADSum = await db.select({ total: sql<string>`COALESCE(SUM(${users.totalEarned}), '0')` }).from(users);
-        const todayPADQuery = await db.execute(sql`SELECT COALESCE(SUM(total_earned), '0') as total FROM users WHERE DATE(updated_at) = CURRENT_DATE`);
-        const yesterdayPADQuery = await db.execute(sql`SELECT COALESCE(SUM(total_earned), '0') as total FROM users WHERE DATE(updated_at) = CURRENT_DATE - INTERVAL '1 day'`);
-        const totalPayoutsSum = await db.select({ total: sql<string>`COALESCE(SUM(${withdrawals.amount}), '0')` }).from(withdrawals).where(sql`${withdrawals.status} IN ('completed', 'success', 'paid', 'Approved')`);
-        const todayPayoutsSum = await db.select({ total: sql<string>`COALESCE(SUM(${withdrawals.amount}), '0')` }).from(withdrawals).where(sql`${withdrawals.status} IN ('completed', 'success', 'paid', 'Approved') AND DATE(${withdrawals.updatedAt}) = CURRENT_DATE`);
-        const yesterdayPayoutsSum = await db.select({ total: sql<string>`COALESCE(SUM(${withdrawals.amount}), '0')` }).from(withdrawals).where(sql`${withdrawals.status} IN ('completed', 'success', 'paid', 'Approved') AND DATE(${withdrawals.updatedAt}) = CURRENT_DATE - INTERVAL '1 day'`);
-        const totalTasksCount = await db.select({ count: sql<number>`count(*)` }).from(advertiserTasks);
-        const todayTasksCount = await db.select({ count: sql<number>`count(*)` }).from(advertiserTasks).where(sql`DATE(${advertiserTasks.createdAt}) = CURRENT_DATE`);
-        const yesterdayTasksCount = await db.select({ count: sql<number>`count(*)` }).from(advertiserTasks).where(sql`DATE(${advertiserTasks.createdAt}) = CURRENT_DATE - INTERVAL '1 day'`);
-        const pendingWithdrawalsCount = await db.select({ count: sql<number>`count(*)` }).from(withdrawals).where(sql`${withdrawals.status} = 'pending'`);
-        const approvedWithdrawalsCount = await db.select({ count: sql<number>`count(*)` }).from(withdrawals).where(sql`${withdrawals.status} IN ('completed', 'success', 'paid', 'Approved')`);
-        const rejectedWithdrawalsCount = await db.select({ count: sql<number>`count(*)` }).from(withdrawals).where(sql`${withdrawals.status} = 'rejected'`);
-        
-        const totalUsers = totalUsersCount[0]?.count || 0;
-        const activeUsers = dailyActiveCount[0]?.count || 0;
-        const totalAds = totalAdsSum[0]?.total || 0;
-        const todayAds = todayAdsSum[0]?.total || 0;
-        const yesterdayAds = (yesterdayAdsQuery.rows[0] as any)?.total || 0;
-        const totalPAD = Math.round(parseFloat(totalPADSum[0]?.total || '0') * 100000);
-        const todayPAD = Math.round(parseFloat((todayPADQuery.rows[0] as any)?.total || '0') * 100000);
-        const yesterdayPAD = Math.round(parseFloat((yesterdayPADQuery.rows[0] as any)?.total || '0') * 100000);
-        const totalPayouts = formatUSD(totalPayoutsSum[0]?.total || '0');
-        const todayPayouts = formatUSD(todayPayoutsSum[0]?.total || '0');
-        const yesterdayPayouts = formatUSD(yesterdayPayoutsSum[0]?.total || '0');
-        const totalTasks = totalTasksCount[0]?.count || 0;
-        const todayTasks = todayTasksCount[0]?.count || 0;
-        const yesterdayTasks = yesterdayTasksCount[0]?.count || 0;
-        const pendingRequests = pendingWithdrawalsCount[0]?.count || 0;
-        const approvedRequests = approvedWithdrawalsCount[0]?.count || 0;
-        const rejectedRequests = rejectedWithdrawalsCount[0]?.count || 0;
-        
-        const adminPanelMessage = 
-          `🎛 <b>CASHWATCH ADMIN PANEL</b>\n` +
-          `━━━━━━━━━━━━━━━━━━━━━━\n\n` +
-          
-          `👥 <b>USERS</b>\n` +
-          `┌ Total  ∙ <code>${totalUsers.toLocaleString()}</code>\n` +
-          `└ Active ∙ <code>${activeUsers.toLocaleString()}</code>\n\n` +
-          
-          `🎬 <b>AD VIEWS</b>\n` +
-          `┌ Total     ∙ <code>${totalAds.toLocaleString()}</code>\n` +
-          `├ Today     ∙ <code>${todayAds.toLocaleString()}</code>\n` +
-          `└ Yesterday ∙ <code>${yesterdayAds.toLocaleString()}</code>\n\n` +
-          
-          `💰 <b>PAD DISTRIBUTED</b>\n` +
-          `┌ Total     ∙ <code>${totalPAD.toLocaleString()}</code>\n` +
-          `├ Today     ∙ <code>${todayPAD.toLocaleString()}</code>\n` +
-          `└ Yesterday ∙ <code>${yesterdayPAD.toLocaleString()}</code>\n\n` +
-          
-          `💸 <b>PAYOUTS (TON)</b>\n` +
-          `┌ Total     ∙ <code>${totalPayouts}</code>\n` +
-          `├ Today     ∙ <code>${todayPayouts}</code>\n` +
-          `└ Yesterday ∙ <code>${yesterdayPayouts}</code>\n\n` +
-          
-          `📋 <b>TASKS</b>\n` +
-          `┌ Total     ∙ <code>${totalTasks}</code>\n` +
-          `├ Today     ∙ <code>${todayTasks}</code>\n` +
-          `└ Yesterday ∙ <code>${yesterdayTasks}</code>\n\n` +
-          
-          `📊 <b>WITHDRAWALS</b>\n` +
-          `┌ ✅ Approved ∙ <code>${approvedRequests}</code>\n` +
-          `├ ❌ Rejected ∙ <code>${rejectedRequests}</code>\n` +
-          `└ ⏳ Pending  ∙ <code>${pendingRequests}</code>\n\n` +
-          
-          `━━━━━━━━━━━━━━━━━━━━━━\n` +
-          `🕐 ${new Date().toLocaleString('en-US', { timeZone: 'UTC', dateStyle: 'short', timeStyle: 'short' })} UTC`;
+        const adminPanelMessage = await buildAdminPanelMessage();
         
         // Send message with inline buttons (vertically arranged)
         await fetch(`https://api.telegram.org/bot${TELEGRAM_BOT_TOKEN}/sendMessage`, {
@@ -1822,14 +1921,7 @@ ${walletAddress}
             chat_id: chatId,
             text: adminPanelMessage,
             parse_mode: 'HTML',
-            reply_markup: {
-              inline_keyboard: [
-                [{ text: '💰 Pending Withdrawals', callback_data: 'admin_pending_withdrawals' }],
-                [{ text: '🔔 Announcement', callback_data: 'admin_announce' }],
-                [{ text: '📊 Advertise', callback_data: 'admin_advertise' }],
-                [{ text: '🔄 Refresh', callback_data: 'admin_refresh' }]
-              ]
-            }
+            reply_markup: ADMIN_PANEL_MARKUP
           })
         });
         
@@ -1866,8 +1958,8 @@ ${walletAddress}
           
           if (referrer) {
             console.log(`👤 Found referrer: ${referrer.id} (${referrer.firstName || 'No name'}) via referral code: ${referralCode}`);
-            console.log(`🔍 Referrer details: ID=${referrer.id}, TelegramID=${referrer.telegram_id}, RefCode=${referrer.referralCode}`);
-            console.log(`🔍 New user details: ID=${dbUser.id}, TelegramID=${dbUser.telegram_id}, RefCode=${dbUser.referralCode}`);
+            if (LOG_DEBUG) console.log(`🔍 Referrer details: ID=${referrer.id}, TelegramID=${referrer.telegram_id}, RefCode=${referrer.referralCode}`);
+            if (LOG_DEBUG) console.log(`🔍 New user details: ID=${dbUser.id}, TelegramID=${dbUser.telegram_id}, RefCode=${dbUser.referralCode}`);
             
             // Verify both users have valid IDs before creating referral
             if (!referrer.id || !dbUser.id) {
@@ -1901,13 +1993,7 @@ Reason: Self-referral attempt detected.
 
 Please contact support if you believe this is a mistake.`;
                 
-                const supportButton = {
-                  inline_keyboard: [[
-                    { text: '👉🏻 Contact Support', url: 'https://t.me/szxzyz' }
-                  ]]
-                };
-                
-                await sendUserTelegramNotification(chatId, banMessage, supportButton, 'HTML');
+                await sendUserTelegramNotification(chatId, banMessage, SELF_REFERRAL_SUPPORT_MARKUP, 'HTML');
                 
                 return true;
               }
@@ -2105,6 +2191,7 @@ export async function setupTelegramWebhook(webhookUrl: string, retries = 3): Pro
           url: webhookUrl,
           allowed_updates: ['message', 'callback_query'],
           drop_pending_updates: true,
+          max_connections: 40,
         }),
       });
 
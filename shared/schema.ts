@@ -55,7 +55,7 @@ export const users = pgTable("users", {
   lastStreakDate: timestamp("last_streak_date"),
   level: integer("level").default(1),
   referredBy: varchar("referred_by"),
-  referralCode: text("referral_code"),
+  referralCode: text("referral_code").default(sql`substr(md5(random()::text || clock_timestamp()::text), 1, 12)`),
   friendsInvited: integer("friends_invited"),
   firstAdWatched: boolean("first_ad_watched").default(false),
   flagged: boolean("flagged").default(false),